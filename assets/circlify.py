@@ -18,6 +18,8 @@ import logging
 import math
 import sys
 
+import numpy as np
+
 __version__ = "0.13"
 
 
@@ -27,59 +29,57 @@ log.addHandler(logging.NullHandler())
 _eps = sys.float_info.epsilon
 
 
-try:  # pragma: no cover
+def get_default_label(count, circle):
+    """Generates a default label."""
+    if circle.ex and "id" in circle.ex:
+        label = str(circle.ex["id"])
+    elif circle.ex and "datum" in circle.ex:
+        label = circle.ex["datum"]
+    elif circle.ex:
+        label = str(circle.ex)
+    else:
+        label = "#" + str(count)
+    return label
+
+
+def _bubbles(circles, fname, labels=None, lim=None):
+    """Debugging function displays circles with matplotlib."""
+    # matplotlib is only imported when drawing, so importing this module stays cheap
     import matplotlib.pyplot as plt
 
-    def get_default_label(count, circle):
-        """Generates a default label."""
-        if circle.ex and "id" in circle.ex:
-            label = str(circle.ex["id"])
-        elif circle.ex and "datum" in circle.ex:
-            label = circle.ex["datum"]
-        elif circle.ex:
-            label = str(circle.ex)
+    if not labels:
+        labels = range(len(circles))
+    _, ax = plt.subplots(figsize=(8.0, 8.0))
+    for circle, label in zip(circles, labels):
+        x, y, r = circle
+        ax.add_patch(plt.Circle((x, y), r, alpha=0.2, linewidth=2, fill=False))
+        if '-' in label:
+            ax.text(x - 0.04, y + r - 0.02, label)
         else:
-            label = "#" + str(count)
-        return label
-
-    def _bubbles(circles, fname, labels=None, lim=None):
-        """Debugging function displays circles with matplotlib."""
-        if not labels:
-            labels = range(len(circles))
-        _, ax = plt.subplots(figsize=(8.0, 8.0))
-        for circle, label in zip(circles, labels):
-            x, y, r = circle
-            ax.add_patch(plt.Circle((x, y), r, alpha=0.2, linewidth=2, fill=False))
-            if '-' in label:
-                ax.text(x - 0.04, y + r - 0.02, label)
-            else:
-                ax.text(x, y, label)
-        enclosure = enclose(circles)
-        n = len(circles)
-        if enclosure in circles:
-            n = n - 1
-        d = density(circles, enclosure)
-        if lim is None:
-            lim = max(
-                max(
-                    abs(circle.x) + circle.r,
-                    abs(circle.y) + circle.r,
-                )
-                for circle in circles
+            ax.text(x, y, label)
+    enclosure = enclose(circles)
+    n = len(circles)
+    if enclosure in circles:
+        n = n - 1
+    d = density(circles, enclosure)
+    if lim is None:
+        lim = max(
+            max(
+                abs(circle.x) + circle.r,
+                abs(circle.y) + circle.r,
             )
-        plt.xlim(-lim, lim)
-        plt.ylim(-lim, lim)
-        plt.axis('off')
-        plt.savefig(fname)
-
-    def bubbles(circles, fname, labels=None, lim=None):
-        if not labels:
-            labels = [get_default_label(i, c) for i, c in enumerate(circles)]
-        return _bubbles([c.circle for c in circles], fname, labels, lim)
+            for circle in circles
+        )
+    plt.xlim(-lim, lim)
+    plt.ylim(-lim, lim)
+    plt.axis('off')
+    plt.savefig(fname)
 
 
-except ImportError:  # pragma: no cover
-    pass
+def bubbles(circles, fname, labels=None, lim=None):
+    if not labels:
+        labels = [get_default_label(i, c) for i, c in enumerate(circles)]
+    return _bubbles([c.circle for c in circles], fname, labels, lim)
 
 
 _Circle = collections.namedtuple("_Circle", ["x", "y", "r"])
@@ -332,6 +332,455 @@ def place_new_A1_0(radius, next_, const_placed_circles, get_hole_degree):
     return placed_circles
 
 
+class _PackerA1_0:
+    """Incremental version of place_new_A1_0 with get_hole_degree_radius_w.
+
+    Places exactly the circles the reference implementation does, but:
+
+    * only pairs of placed circles close enough for the new circle to touch
+      both are tried (the other pairs have no intersection). Radiuses come in
+      descending order, so a pair that is too far apart once stays too far.
+    * candidates are checked for overlaps against the circles sharing a grid
+      cell with them. Every circle is registered in all the cells its bounding
+      box covers. The circle that last blocked a candidate of a pair is
+      checked first, as pairs inside the packing stay blocked by the same
+      circles.
+    * a candidate blocked by a circle stays blocked by it down to the
+      largest radius below for which a circle touches the pair and the
+      blocker (a root of the Apollonius problem), it is not computed again
+      before. Pairs blocked on both sides for every radius left are removed:
+      only the pairs along the front of the packing and around the holes
+      still large enough are left.
+    * while the radius does not change, candidates stay where they are: their
+      positions are kept, the blocked ones are not tried again, the free ones
+      are only checked against the circles placed since and their hole
+      degrees only add the terms of those circles.
+    * hole degrees of the remaining candidates are computed in one NumPy
+      batch and summed in placement order, like sum() in the reference.
+    * when the radius changes, candidates are scored from scratch against
+      every placed circle. Hole degree terms are never negative for a free
+      candidate, so the placed circles are summed up by coarse grid cell
+      into a lower bound, and only the candidates whose bound can still
+      beat the best hole degree found so far are scored.
+
+    """
+
+    # Per pair arrays, filtered and extended together: (name, dtype, columns, initial value).
+    _pair_fields = (
+        ("pair_i", np.int64, 1, 0),
+        ("pair_j", np.int64, 1, 0),
+        ("pair_gap", float, 1, 0.0),
+        ("pair_at", float, 1, np.nan),
+        ("pair_x", float, 2, 0.0),
+        ("pair_y", float, 2, 0.0),
+        ("pair_found", bool, 2, False),
+        ("pair_clear", np.int64, 2, 0),
+        ("pair_blocker", np.int64, 2, -1),
+        ("pair_blocked", float, 2, np.nan),
+        ("pair_hole", float, 2, 0.0),
+        ("pair_scored", np.int64, 2, 0),
+        ("pair_radius", float, 2, np.nan),
+        ("pair_until", float, 2, np.inf),
+    )
+
+    # Coarse cells per side (a multiple of 4) for the hole degree lower
+    # bounds, and the number of placed circles from which candidates are
+    # pruned with them.
+    _groups = 32
+    _prune_from = 256
+
+    def __init__(self, radiuses, capacity=4):
+        """Initialize the packer.
+
+        Args:
+            radiuses: radiuses of every circle that will be placed.
+            capacity: initial number of circles per grid cell.
+
+        """
+        radiuses = np.asarray(radiuses, dtype=float)
+        n = len(radiuses)
+        self.xs = np.zeros(n)
+        self.ys = np.zeros(n)
+        self.rs = np.zeros(n)
+        self.count = 0
+        self.radiuses = radiuses
+        self.smallest = float(radiuses.min())
+
+        # Pairs (i < j) of placed circles that may still get candidates, in
+        # the first "pairs" rows of the pair arrays:
+        # * pair_i, pair_j, pair_gap: the circles and the distance between them.
+        # * pair_x, pair_y, pair_found: where the 2 candidates of the pair
+        #   are (and whether they exist) for the radius in pair_at.
+        # * pair_clear: number of circles a candidate is known not to overlap.
+        # * pair_blocker, pair_blocked: circle that last overlapped a
+        #   candidate (-1 for none) and the radius it overlaps for.
+        # * pair_hole: hole degree of a candidate over the first pair_scored
+        #   circles, for the radius in pair_radius.
+        # * pair_until: radius a candidate overlaps its blocker down to, it
+        #   is not tried again before (inf when unknown).
+        self.pairs = 0
+        self._grow_pairs(64)
+
+        # The packing stays well within this extent around (0, 0); circles
+        # falling outside are registered in the border cells, which keeps
+        # the lookups correct.
+        extent = 3.0 * math.sqrt(float(np.sum(radiuses ** 2))) + 2.0 * float(radiuses.max())
+        self.cell = max(2.0 * float(np.median(radiuses)), 2.0 * extent / 1024)
+        self.origin = -extent
+        self.size = int(2.0 * extent / self.cell) + 1
+        self.cells = np.full((self.size, self.size, capacity), -1, dtype=np.int32)
+        self.fill = np.zeros((self.size, self.size), dtype=np.int32)
+
+        # Sums of r, r * x, r * y and r * r of the circles centered in each
+        # coarse cell, for the hole degree lower bounds.
+        self.group_cell = 2.0 * extent / self._groups
+        self.group_sums = np.zeros((4, self._groups * self._groups))
+
+    def _grow_pairs(self, capacity):
+        for name, dtype, columns, value in self._pair_fields:
+            shape = (capacity,) if columns == 1 else (capacity, columns)
+            array = np.full(shape, value, dtype=dtype)
+            if self.pairs > 0:
+                array[:self.pairs] = getattr(self, name)[:self.pairs]
+            setattr(self, name, array)
+
+    def _cell_index(self, coords):
+        index = np.floor((np.asarray(coords) - self.origin) / self.cell).astype(np.int64)
+        return np.clip(index, 0, self.size - 1)
+
+    def _register(self, index):
+        x, y, r = self.xs[index], self.ys[index], self.rs[index]
+        c0, c1 = self._cell_index([x - r, x + r])
+        r0, r1 = self._cell_index([y - r, y + r])
+        cols = np.arange(c0, c1 + 1)[:, None]
+        rows = np.arange(r0, r1 + 1)[None, :]
+        slots = self.fill[cols, rows]
+        while slots.max() >= self.cells.shape[2]:
+            extra = np.full(self.cells.shape, -1, dtype=np.int32)
+            self.cells = np.concatenate([self.cells, extra], axis=2)
+        self.cells[cols, rows, slots] = index
+        self.fill[cols, rows] += 1
+
+    def _add(self, circle):
+        index = self.count
+        self.xs[index], self.ys[index], self.rs[index] = circle
+        self.count += 1
+        self._register(index)
+        x, y, r = circle
+        col = min(max(int((x - self.origin) / self.group_cell), 0), self._groups - 1)
+        row = min(max(int((y - self.origin) / self.group_cell), 0), self._groups - 1)
+        sums = self.group_sums[:, col * self._groups + row]
+        sums[0] += r
+        sums[1] += r * x
+        sums[2] += r * y
+        sums[3] += r * r
+
+        # New pairs with every placed circle this one is close enough to.
+        if index > 0:
+            x = self.xs[:index] - self.xs[index]
+            y = self.ys[:index] - self.ys[index]
+            gap = np.sqrt(x * x + y * y) - self.rs[:index] - self.rs[index]
+            margin = self.rs[index] * _eps * 10.0
+            near = np.flatnonzero(gap <= 2.0 * (self.rs[index] + margin) * (1.0 + 1e-9))
+            start, end = self.pairs, self.pairs + len(near)
+            if end > len(self.pair_i):
+                self._grow_pairs(2 * end)
+            # The other fields of the new rows still hold their initial value.
+            self.pair_i[start:end] = near
+            self.pair_j[start:end] = index
+            self.pair_gap[start:end] = gap[near]
+            self.pairs = end
+
+    def _intersections(self, pairs, radius, margin):
+        """Vectorized get_placement_candidates over some pairs, same operations in the same order."""
+        i, j = self.pair_i[pairs], self.pair_j[pairs]
+        x1, y1, r1 = self.xs[i], self.ys[i], self.rs[i] + (radius + margin)
+        x2, y2, r2 = self.xs[j], self.ys[j], self.rs[j] + (radius + margin)
+        dx, dy = x2 - x1, y2 - y1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            d = np.sqrt(dx * dx + dy * dy)
+            a = (r1 * r1 - r2 * r2 + d * d) / (2 * d)
+            h = np.sqrt(r1 * r1 - a * a)
+            xm = x1 + a * dx / d
+            ym = y1 + a * dy / d
+            xs1 = xm + h * dy / d
+            xs2 = xm - h * dy / d
+            ys1 = ym - h * dx / d
+            ys2 = ym + h * dx / d
+        found = (d != 0) & ~np.isnan(h)
+        # A single intersection only gives the first candidate.
+        second = found & ~((xs1 == xs2) & (ys1 == ys2))
+        self.pair_x[pairs] = np.stack([xs1, xs2], axis=1)
+        self.pair_y[pairs] = np.stack([ys1, ys2], axis=1)
+        self.pair_found[pairs] = np.stack([found, second], axis=1)
+        self.pair_clear[pairs] = 0
+        self.pair_at[pairs] = radius
+
+    def _candidates(self, radius):
+        """Candidates not known to overlap a placed circle, by pair row."""
+        margin = radius * _eps * 10.0
+        keep = self.pair_gap[:self.pairs] <= 2.0 * (radius + margin) * (1.0 + 1e-9)
+        # Pairs now too far apart are removed once they make a quarter of the
+        # rows, with those blocked on both sides for every radius left.
+        kept = int(np.count_nonzero(keep))
+        if kept < 0.75 * self.pairs:
+            until = self.pair_until[:self.pairs]
+            keep &= (until[:, 0] >= self.smallest) | (until[:, 1] >= self.smallest)
+            kept = int(np.count_nonzero(keep))
+            for name, dtype, columns, value in self._pair_fields:
+                array = getattr(self, name)
+                array[:kept] = array[:self.pairs][keep]
+                array[kept:self.pairs] = value
+            self.pairs = kept
+            keep = np.ones(kept, dtype=bool)
+
+        # Pairs dropped but not removed yet have no candidates, those blocked on both sides are not computed.
+        active = self.pair_until[:self.pairs] >= radius
+        stale = np.flatnonzero((self.pair_at[:self.pairs] != radius) & keep & (active[:, 0] | active[:, 1]))
+        if len(stale) > 0:
+            self._intersections(stale, radius, margin)
+        if kept < self.pairs:
+            self.pair_found[:self.pairs][~keep] = False
+
+        pair, which = np.nonzero(self.pair_found[:self.pairs] & active & (self.pair_blocked[:self.pairs] != radius))
+        return self.pair_x[pair, which], self.pair_y[pair, which], pair, which
+
+    def _blocked_until(self, xs, ys, radius, ci, cj, ck, tol=1e-6):
+        """Radius down to which candidates overlapping the circles ck keep overlapping them.
+
+        Along the radius, the candidate of a pair moves continuously and
+        only enters or leaves ck where the circle touches ci, cj and ck.
+        With q the center relative to ci, subtracting the tangency equations
+        gives q = q0 + rho * q1, and |q| = r_i + rho a quadratic in rho. A
+        candidate clearly overlapping ck for the current radius overlaps it
+        down to the largest root below (-inf without one). Near degenerate
+        cases (aligned centers, near double roots, overlaps within tol) give
+        inf: the candidate is tried again as usual.
+
+        """
+        x, y = xs - self.xs[ck], ys - self.ys[ck]
+        overlap = self.rs[ck] + radius - np.sqrt(x * x + y * y)
+        ri = self.rs[ci]
+        ux, uy = self.xs[cj] - self.xs[ci], self.ys[cj] - self.ys[ci]
+        vx, vy = self.xs[ck] - self.xs[ci], self.ys[ck] - self.ys[ci]
+        # q . u = bu + rho * cu and q . v = bv + rho * cv
+        bu = (ux * ux + uy * uy - self.rs[cj] ** 2 + ri * ri) / 2
+        bv = (vx * vx + vy * vy - self.rs[ck] ** 2 + ri * ri) / 2
+        cu, cv = ri - self.rs[cj], ri - self.rs[ck]
+        det = ux * vy - uy * vx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            q0x, q0y = (bu * vy - bv * uy) / det, (bv * ux - bu * vx) / det
+            q1x, q1y = (cu * vy - cv * uy) / det, (cv * ux - cu * vx) / det
+            a = q1x * q1x + q1y * q1y - 1.0
+            b = 2.0 * (q0x * q1x + q0y * q1y - ri)
+            c = q0x * q0x + q0y * q0y - ri * ri
+            disc = b * b - 4.0 * a * c
+            root = np.sqrt(np.abs(disc))
+            roots = np.stack([(-b - root) / (2.0 * a), (-b + root) / (2.0 * a)])
+        below = np.where((disc > 0) & (roots < radius * (1.0 - tol)), roots, -np.inf).max(axis=0)
+        certain = (
+            (overlap > tol * (self.rs[ck] + radius))
+            & (np.abs(det) > tol * np.sqrt(ux * ux + uy * uy) * np.sqrt(vx * vx + vy * vy))
+            & (np.abs(a) > tol)
+            & (np.abs(disc) > tol * (b * b + 4.0 * np.abs(a * c)))
+            & ~((disc > 0) & (np.abs(roots - radius) <= tol * radius)).any(axis=0)
+            & np.isfinite(roots).all(axis=0)
+        )
+        return np.where(certain, below * (1.0 + tol), np.inf)
+
+    def _overlapping(self, xs, ys, radius, ci, cj):
+        """First placed circle (other than the pair it was made from) each candidate overlaps, -1 for none."""
+        span = int(2.0 * radius / self.cell) + 2
+        if span * span * self.cells.shape[2] >= self.count:
+            others = np.broadcast_to(np.arange(self.count), (len(xs), self.count))
+        else:
+            c0 = self._cell_index(xs - radius)
+            r0 = self._cell_index(ys - radius)
+            steps = np.arange(span)
+            cols = np.minimum(c0[:, None] + steps, self.size - 1)
+            rows = np.minimum(r0[:, None] + steps, self.size - 1)
+            others = self.cells[cols[:, :, None], rows[:, None, :]].reshape(len(xs), -1)
+
+        present = (others >= 0) & (others != ci[:, None]) & (others != cj[:, None])
+        others = np.where(present, others, 0)
+        x = xs[:, None] - self.xs[others]
+        y = ys[:, None] - self.ys[others]
+        dist = np.sqrt(x * x + y * y) - self.rs[others] - radius
+        overlaps = present & (dist < 0.0)
+        return np.where(overlaps.any(axis=1), others[np.arange(len(xs)), np.argmax(overlaps, axis=1)], -1)
+
+    def _hole_degrees(self, xs, ys, radius, ci, cj, start, initial):
+        """Hole degrees of the candidates, adding the terms of the circles from start on to initial, in order."""
+        # One row per circle (after a first row holding initial), one column per candidate.
+        n = self.count
+        rs = self.rs[start:n, None]
+        terms = np.empty((n - start + 1, len(xs)))
+        terms[0] = initial
+        rows = terms[1:]
+        np.subtract(self.xs[start:n, None], xs, out=rows)
+        rows *= rows
+        y = self.ys[start:n, None] - ys
+        y *= y
+        rows += y
+        np.sqrt(rows, out=rows)
+        rows -= radius
+        rows -= rs
+        rows *= rs
+        # The pair a candidate was made from is not part of its hole degree.
+        for c in (ci, cj):
+            inside = c >= start
+            rows[c[inside] - start, np.flatnonzero(inside)] = 0.0
+        return np.cumsum(terms, axis=0, out=terms)[-1]
+
+    def _lower_bounds(self, xs, ys, radius, sums):
+        """Lower bounds of the hole degrees of free candidates (pair circles included, up to rounding).
+
+        For the circles summed up in a column of sums, the sum of
+        r * (|p - c| - radius - r) is at least |sum of r * (p - c)| -
+        radius * sum of r - sum of r * r, and at least 0 as none of its terms
+        is negative.
+
+        """
+        r, rx, ry, rr = sums[:, sums[0] > 0][:, None, :]
+        x = xs[:, None] * r - rx
+        y = ys[:, None] * r - ry
+        return np.maximum(np.sqrt(x * x + y * y) - radius * r - rr, 0.0).sum(axis=1)
+
+    def _check_pruned(self, xs, ys, radius, ci, cj, best, batch=16):
+        """Check candidates against the grid and score the free ones from scratch, skipping those that cannot win.
+
+        Candidates go by increasing lower bound, a batch at a time, until the
+        bounds left exceed the best hole degree: those can neither beat it
+        nor be free with a near zero hole degree. The bounds of every group
+        of 4 x 4 coarse cells order the candidates, those of every coarse
+        cell are only computed for the candidates left after the first
+        batch. The slack covers the rounding of the bounds and of the sums,
+        and the terms of the pair circles, which the bounds include.
+
+        Returns:
+            the first overlapped circle of each candidate (-1 for none or
+            unchecked), the hole degrees (inf for overlapping or unchecked
+            ones) and which candidates were checked.
+
+        """
+        blocker = np.full(len(xs), -1, dtype=np.int64)
+        hole_degrees = np.full(len(xs), np.inf)
+        checked = np.zeros(len(xs), dtype=bool)
+        size = self._groups // 4
+        coarse = self.group_sums.reshape(4, size, 4, size, 4).sum(axis=(2, 4)).reshape(4, -1)
+        bounds = self._lower_bounds(xs, ys, radius, coarse)
+        order = np.argsort(bounds, kind="stable")
+        slack = 1e-9 * float(np.sum(self.group_sums[0])) * (2.0 * abs(self.origin) + radius)
+        start = 0
+        while start < len(order) and bounds[order[start]] <= best + slack:
+            group = order[start:start + batch]
+            blocker[group] = self._overlapping(xs[group], ys[group], radius, ci[group], cj[group])
+            checked[group] = True
+            group = group[blocker[group] < 0]
+            if len(group) > 0:
+                hole_degrees[group] = self._hole_degrees(xs[group], ys[group], radius, ci[group], cj[group], 0, 0.0)
+                best = min(best, float(hole_degrees[group].min()))
+            start += batch
+            if start == batch and start < len(order):
+                # Finer bounds for the candidates the coarse ones cannot rule out yet.
+                rest = order[start:]
+                rest = rest[bounds[rest] <= best + slack]
+                bounds[rest] = self._lower_bounds(xs[rest], ys[rest], radius, self.group_sums)
+                order = np.concatenate([order[:start], rest[np.argsort(bounds[rest], kind="stable")]])
+        return blocker, hole_degrees, checked
+
+    def place(self, radius):
+        """Place the next circle, as place_new_A1_0 would.
+
+        Returns:
+            the placed circle.
+
+        """
+        if self.count <= 1:
+            x = radius if self.count == 0 else -radius
+            circle = _Circle(x, float(0.0), radius)
+            self._add(circle)
+            return circle
+
+        xs, ys, pair, which = self._candidates(radius)
+        ci, cj = self.pair_i[pair], self.pair_j[pair]
+        if self.count == 2:
+            # Nothing else to overlap or score: first candidate of the only pair.
+            if len(xs) == 0:
+                raise ValueError("cannot place circle for value " + str(radius ** 2))
+            circle = _Circle(float(xs[0]), float(ys[0]), radius)
+            self._add(circle)
+            return circle
+
+        # Candidates free before the last circle was placed can only overlap
+        # it, and continue the sums of their hole degrees. The others are
+        # checked against their last blocker first, then against the grid,
+        # and scored from scratch.
+        n = self.count
+        recent = self.pair_clear[pair, which] == n - 1
+        blocker = np.where(recent, n - 1, self.pair_blocker[pair, which])
+        known = np.maximum(blocker, 0)
+        x = xs - self.xs[known]
+        y = ys - self.ys[known]
+        overlaps = (blocker >= 0) & (np.sqrt(x * x + y * y) - self.rs[known] - radius < 0.0)
+        blocker[~overlaps] = -1
+
+        hole_degrees = np.full(len(xs), np.inf)
+        continued = recent & ~overlaps
+        start = np.where(self.pair_radius[pair, which] == radius, self.pair_scored[pair, which], 0)
+        initial = np.where(start > 0, self.pair_hole[pair, which], 0.0)
+        for first in np.unique(start[continued]).tolist():
+            group = continued & (start == first)
+            hole_degrees[group] = self._hole_degrees(xs[group], ys[group], radius, ci[group], cj[group], first, initial[group])
+
+        check = ~overlaps & ~recent
+        checked = np.ones(len(xs), dtype=bool)
+        # Sums continued for the next circle beat pruning when its radius is the same.
+        last = n + 1 == len(self.radiuses)
+        if n >= self._prune_from and np.count_nonzero(check) > 32 and (last or self.radiuses[n + 1] != radius):
+            best = float(hole_degrees.min())
+            blocker[check], hole_degrees[check], checked[check] = self._check_pruned(xs[check], ys[check], radius, ci[check], cj[check], best)
+        else:
+            blocker[check] = self._overlapping(xs[check], ys[check], radius, ci[check], cj[check])
+            fresh = check & (blocker < 0)
+            hole_degrees[fresh] = self._hole_degrees(xs[fresh], ys[fresh], radius, ci[fresh], cj[fresh], 0, 0.0)
+
+        # Candidates pruned unchecked are tried again from scratch.
+        free = checked & (blocker < 0)
+        blocked = blocker >= 0
+        self.pair_blocker[pair, which] = blocker
+        self.pair_blocked[pair[blocked], which[blocked]] = radius
+        self.pair_clear[pair, which] = np.where(free, n, 0)
+        # Blocked candidates are not tried again while the radius does not
+        # change, after a change they all are: find how long they stay blocked then.
+        if radius != self.rs[n - 1]:
+            self.pair_until[pair[blocked], which[blocked]] = self._blocked_until(
+                xs[blocked], ys[blocked], radius, ci[blocked], cj[blocked], blocker[blocked]
+            )
+        scored = hole_degrees < np.inf
+        self.pair_hole[pair, which] = hole_degrees
+        self.pair_scored[pair, which] = n
+        self.pair_radius[pair, which] = np.where(scored, radius, np.nan)
+        if not free.any():
+            raise ValueError("cannot place circle for value " + str(radius ** 2))
+
+        # The scored candidates in the order of the reference (by pair, first then second), which breaks ties.
+        scored = np.flatnonzero(scored)
+        scored = scored[np.lexsort((which[scored], cj[scored], ci[scored]))]
+        xs, ys, hole_degrees = xs[scored], ys[scored], hole_degrees[scored]
+
+        margin = radius * _eps * 10.0
+        if np.any(np.abs(hole_degrees) < margin):
+            # The reference stops early on a near zero hole degree, let it decide.
+            placed = [_Circle(*circle) for circle in zip(self.xs[:n].tolist(), self.ys[:n].tolist(), self.rs[:n].tolist())]
+            circle = place_new_A1_0(radius, None, placed, get_hole_degree_radius_w)[-1]
+        else:
+            best = int(np.argmin(hole_degrees))
+            circle = _Circle(float(xs[best]), float(ys[best]), radius)
+        self._add(circle)
+        return circle
+
+
 def pack_A1_0(data):
     """Pack circles whose area is proportional to the input data.
 
@@ -351,13 +800,9 @@ def pack_A1_0(data):
             min_max_ratio,
         )
     assert data == sorted(data, reverse=True), "data must be sorted (desc)"
-    placed_circles = []
     radiuses = [math.sqrt(value) for value in data]
-    for radius, next_ in look_ahead(radiuses):
-        placed_circles = place_new_A1_0(
-            radius, next_, placed_circles, get_hole_degree_radius_w
-        )
-    return placed_circles
+    packer = _PackerA1_0(radiuses)
+    return [packer.place(radius) for radius in radiuses]
 
 
 def extendBasis(B, p):
@@ -465,17 +910,25 @@ def enclose(circles):
     p, e = None, None
     # random.shuffle(circles)
 
-    n = len(circles)
+    if not circles:
+        return e
+    # enclosesWeak against every circle at once: scanning again from the
+    # first circle after each change of basis, the first circle not weakly
+    # enclosed is the next one to extend the basis with.
+    xs, ys, rs = np.array([tuple(circle) for circle in circles], dtype=float).T
     i = 0
-    while i < n:
+    while True:
+        if e is not None:
+            dr = e.r - rs + 1e-6
+            dx = xs - e.x
+            dy = ys - e.y
+            outside = np.flatnonzero(~((dr > 0) & (dr * dr > dx * dx + dy * dy)))
+            if len(outside) == 0:
+                return e
+            i = int(outside[0])
         p = circles[i]
-        if e is not None and enclosesWeak(e, p):
-            i = i + 1
-        else:
-            B = extendBasis(B, p)
-            e = encloseBasis(B)
-            i = 0
-    return e
+        B = extendBasis(B, p)
+        e = encloseBasis(B)
 
 
 def scale(circle, target, enclosure):
@@ -0,0 +1,66 @@
+'''
+Benchmark: circle packing in assets/circlify.py.
+
+Usage:
+    python benchmarks/bench_circlify.py [--sizes 10 100 1000 10000] [--reference-max N] [--distinct-max N]
+
+Packs N circles with pack_A1_0 and, up to --reference-max circles, with the
+reference loop over every pair of placed circles (place_new_A1_0). Both must
+place every circle at the same position. Two series:
+
+* clusters: cluster-like sizes, many small equal values and a few large ones.
+* distinct: every value different (uniform between 1 and 101), so the radius
+  changes between all circles and no candidate is kept from one circle to
+  the next. Up to --distinct-max circles.
+'''
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from assets import circlify
+
+def synthetic_data(num_circles, seed=0):
+    rng = random.Random(seed)
+    return sorted((int(rng.paretovariate(1.0)) for _ in range(num_circles)), reverse=True)
+
+def distinct_data(num_circles, seed=0):
+    rng = random.Random(seed)
+    return sorted((rng.random() * 100 + 1 for _ in range(num_circles)), reverse=True)
+
+def reference_pack(data):
+    placed_circles = []
+    radiuses = [math.sqrt(value) for value in data]
+    for radius, next_ in circlify.look_ahead(radiuses):
+        placed_circles = circlify.place_new_A1_0(radius, next_, placed_circles, circlify.get_hole_degree_radius_w)
+    return placed_circles
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Circle packing benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 300, 1000, 3000, 10000])
+    parser.add_argument("--reference-max", type=int, default=300)
+    parser.add_argument("--distinct-max", type=int, default=3000)
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>10} {:>12}".format("series", "circles", "packed s", "reference s"))
+    for series, make_data, max_circles in [("clusters", synthetic_data, None), ("distinct", distinct_data, args.distinct_max)]:
+        for num_circles in args.sizes:
+            if max_circles != None and num_circles > max_circles:
+                continue
+            data = make_data(num_circles)
+            packed_time, packed = timed(lambda: circlify.pack_A1_0(data))
+            reference = "-"
+            if num_circles <= args.reference_max:
+                reference_time, reference_circles = timed(lambda: reference_pack(data))
+                assert reference_circles == packed
+                reference = "{:.2f}".format(reference_time)
+            print("{:>10} {:>8} {:>10.2f} {:>12}".format(series, num_circles, packed_time, reference))
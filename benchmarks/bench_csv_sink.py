@@ -0,0 +1,134 @@
+'''
+Benchmark: per-row open/append csv writes (previous main.py) against the buffered CsvSink.
+
+Usage:
+    python benchmarks/bench_csv_sink.py [--proteins N] [--lcrs K]
+
+Reports wall time, files opened, existence checks and write syscalls (from
+/proc/self/io, Linux only) for writing the same synthetic run both ways.
+'''
+import argparse
+import builtins
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+from sinks import CsvSink
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def legacy_write(filepaths, header, rows):
+    '''The write pattern used before CsvSink: check, reopen and append per call
+    '''
+    for filepath in filepaths:
+        if os.path.isfile(filepath):
+            continue
+        with open(filepath, 'w', newline='') as outfile:
+            csv.writer(outfile).writerow(header)
+
+    for filepath in filepaths:
+        with open(filepath, 'a+', newline='') as outfile:
+            writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            for row in rows:
+                writer.writerow(row)
+
+def make_run(num_proteins, num_lcrs, seed=0):
+    rand = random.Random(seed)
+    run = []
+    for protein in range(num_proteins):
+        rows = []
+        clusters = []
+        for index in range(num_lcrs):
+            seq = "".join(rand.choice(AMINO_ACIDS[:6]) for _ in range(rand.randint(12, 80))).lower()
+            rows.append(["P{}.{}".format(protein, index + 1), seq, "1-20", "2", "G", 10, 0.5, "S", 5, 0.25, "A", 3, 0.15, "Q", 2, 0.1])
+            clusters.append("".join(sorted(rand.sample(AMINO_ACIDS, 2))))
+        run.append(("P{}".format(protein), rows, clusters))
+    return run
+
+def syscalls():
+    try:
+        with open("/proc/self/io") as f:
+            stats = dict(line.split(": ") for line in f.read().splitlines())
+        return int(stats["syscw"])
+    except (OSError, KeyError):
+        return 0
+
+def measure(label, fn, outdir):
+    counts = {"open": 0, "isfile": 0}
+    real_open, real_isfile = builtins.open, os.path.isfile
+
+    def counting_open(*args, **kwargs):
+        counts["open"] += 1
+        return real_open(*args, **kwargs)
+
+    def counting_isfile(path):
+        counts["isfile"] += 1
+        return real_isfile(path)
+
+    os.makedirs(os.path.join(outdir, "sequences", "by_id"))
+    os.makedirs(os.path.join(outdir, "sequences", "by_overall"))
+    os.makedirs(os.path.join(outdir, "clusters"))
+
+    writes_before = syscalls()
+    builtins.open, os.path.isfile = counting_open, counting_isfile
+    start = time.perf_counter()
+    try:
+        fn(outdir)
+    finally:
+        elapsed = time.perf_counter() - start
+        builtins.open, os.path.isfile = real_open, real_isfile
+    writes = syscalls() - writes_before
+
+    print("{:<10} {:>9.3f}s {:>10} opens {:>10} isfile {:>10} write syscalls".format(
+        label, elapsed, counts["open"], counts["isfile"], writes))
+
+def run_legacy(run, outdir):
+    overall = os.path.join(outdir, "sequences", "by_overall", "overall.csv")
+    for fid, rows, clusters in run:
+        by_id = os.path.join(outdir, "sequences", "by_id", fid + ".csv")
+        legacy_write([overall, by_id], main.SEQ_HEADER, rows)
+        for row, cluster in zip(rows, clusters):
+            legacy_write([os.path.join(outdir, "clusters", cluster + ".csv")], main.SEQ_HEADER, [row])
+
+def run_sink(run, outdir):
+    overall = os.path.join(outdir, "sequences", "by_overall", "overall.csv")
+    with CsvSink() as sink:
+        for fid, rows, clusters in run:
+            by_id = os.path.join(outdir, "sequences", "by_id", fid + ".csv")
+            sink.writerows(overall, main.SEQ_HEADER, rows)
+            sink.writerows(by_id, main.SEQ_HEADER, rows)
+            for row, cluster in zip(rows, clusters):
+                sink.writerow(os.path.join(outdir, "clusters", cluster + ".csv"), main.SEQ_HEADER, row)
+
+def same_tree(dir_a, dir_b):
+    for root, _, files in os.walk(dir_a):
+        for name in files:
+            path_a = os.path.join(root, name)
+            path_b = os.path.join(dir_b, os.path.relpath(path_a, dir_a))
+            with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+                if fa.read() != fb.read():
+                    return False
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CSV sink benchmark.")
+    parser.add_argument("--proteins", type=int, default=5000)
+    parser.add_argument("--lcrs", type=int, default=3)
+    args = parser.parse_args()
+
+    run = make_run(args.proteins, args.lcrs)
+    print("{} proteins, {} LCRs each".format(args.proteins, args.lcrs))
+
+    workdir = tempfile.mkdtemp()
+    try:
+        measure("per-row", lambda out: run_legacy(run, out), os.path.join(workdir, "legacy"))
+        measure("CsvSink", lambda out: run_sink(run, out), os.path.join(workdir, "sink"))
+        print("identical output:", same_tree(os.path.join(workdir, "legacy"), os.path.join(workdir, "sink")))
+    finally:
+        shutil.rmtree(workdir)
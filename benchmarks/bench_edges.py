@@ -0,0 +1,75 @@
+'''
+Benchmark: drawing the lines between LCRs of the same protein in visual.py.
+
+Usage:
+    python benchmarks/bench_edges.py [--proteins N] [--max-lcrs K]
+
+Builds fid_to_location for N proteins with 1 to K LCRs each (a few proteins with
+many LCRs dominate, as in real proteomes) and times the previous nested loop (one
+ImageDraw.line per pair of LCRs, self pairs included) against
+layout.network_edges plus one line per distinct segment, for every edge mode.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import layout
+import visual
+
+def synthetic_locations(num_proteins, max_lcrs, size, seed=0):
+    rng = random.Random(seed)
+    fid_to_location = {}
+    for protein in range(num_proteins):
+        num_lcrs = min(max_lcrs, int(rng.paretovariate(1.2)))
+        # Stacked nodes (no free space left) share a center
+        centers = [(round(rng.uniform(0, size)), round(rng.uniform(0, size))) for _ in range(num_lcrs)]
+        fid_to_location["P{}".format(protein)] = centers + centers[:num_lcrs // 4]
+    return fid_to_location
+
+def legacy_draw(draw_ctx, fid_to_location):
+    lines = 0
+    for names, centers in fid_to_location.items():
+        if len(centers) <= 1:
+            continue
+        for i in range(len(centers)):
+            for j in range(i, len(centers)):
+                draw_ctx.line([centers[i], centers[j]], fill=(0, 0, 0, 60), width=3)
+                lines += 1
+    return lines
+
+def aggregated_draw(draw_ctx, fid_to_location, mode, max_edges=None):
+    segments, counts = layout.network_edges(fid_to_location, mode, max_edges)
+    for segment, alpha in zip(segments.tolist(), layout.edge_alpha(counts).tolist()):
+        draw_ctx.line(segment, fill=(0, 0, 0, alpha), width=3)
+    return len(segments)
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Edge drawing benchmark.")
+    parser.add_argument("--proteins", type=int, default=2000)
+    parser.add_argument("--max-lcrs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--max-edges", type=int, default=100)
+    args = parser.parse_args()
+
+    from PIL import Image, ImageDraw
+
+    fid_to_location = synthetic_locations(args.proteins, args.max_lcrs, args.size)
+    runs = [("legacy", lambda ctx: legacy_draw(ctx, fid_to_location))]
+    runs += [(mode, lambda ctx, mode=mode: aggregated_draw(ctx, fid_to_location, mode)) for mode in visual.EDGE_MODES if mode != "none"]
+    runs += [("all, cap {}".format(args.max_edges), lambda ctx: aggregated_draw(ctx, fid_to_location, "all", args.max_edges))]
+
+    print("{} proteins, {} LCRs".format(len(fid_to_location), sum(map(len, fid_to_location.values()))))
+    print("{:<14} {:>10} {:>10}".format("edges", "lines", "seconds"))
+    for name, run in runs:
+        draw_ctx = ImageDraw.Draw(Image.new("RGB", (args.size, args.size), "white"), "RGBA")
+        seconds, lines = timed(lambda: run(draw_ctx))
+        print("{:<14} {:>10} {:>10.2f}".format(name, lines, seconds))
@@ -0,0 +1,78 @@
+'''
+Benchmark: node placement in visual.py layouts.
+
+Usage:
+    python benchmarks/bench_layout.py [--nodes 1000 5000 50000] [--legacy-max N]
+
+Lays out one cluster of N single nodes the way ClusterNode.layout does (distance
+from the center by percentage, up to 100 candidate angles per node) with
+layout.pack_in_circle, and, up to --legacy-max nodes, with the previous
+rejection sampling that tried one random angle at a time against every circle
+drawn so far. Reports the time and how many nodes overlap another.
+'''
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import layout
+
+SINGLE_NODE_RADIUS = 5
+
+def cluster_nodes(num_nodes, seed=0):
+    '''Radius of the cluster, and distance of each node to its center (lowest percentage first)
+    '''
+    rng = random.Random(seed)
+    percentages = sorted(rng.randint(0, 100) for _ in range(num_nodes))
+    cluster_radius = 30 * math.log(1 + num_nodes)
+    low, high = percentages[0], percentages[-1]
+    distances = [(cluster_radius - SINGLE_NODE_RADIUS) * (percentage - low) / max(high - low, 1) for percentage in percentages]
+    return cluster_radius, distances
+
+def legacy_place(cluster_radius, distances, seed=0):
+    '''Rejection sampling before layout.py: one random angle at a time, checked against every node placed
+    '''
+    random.seed(seed)
+    placed, overlapping = [], 0
+    for distance in distances:
+        for iteration in range(100):
+            angle = random.random() * (2 * math.pi)
+            position = (distance * math.cos(angle), distance * math.sin(angle))
+            free = all(math.dist(position, other) >= 2 * SINGLE_NODE_RADIUS for other in placed)
+            if free:
+                break
+        overlapping += not free
+        placed.append(position)
+    return overlapping
+
+def packed_place(cluster_radius, distances, seed=0):
+    radii = [SINGLE_NODE_RADIUS] * len(distances)
+    _, overlapping = layout.pack_in_circle(np.random.default_rng(seed), (0, 0), cluster_radius, radii, distances)
+    return overlapping
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layout benchmark.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("{:>8} {:>10} {:>12} {:>10} {:>12}".format("nodes", "packed s", "overlapping", "legacy s", "overlapping"))
+    for num_nodes in args.nodes:
+        cluster_radius, distances = cluster_nodes(num_nodes)
+        packed_time, packed_overlapping = timed(lambda: packed_place(cluster_radius, distances))
+        legacy_time, legacy_overlapping = "-", "-"
+        if num_nodes <= args.legacy_max:
+            legacy_time, legacy_overlapping = timed(lambda: legacy_place(cluster_radius, distances))
+            legacy_time = "{:.2f}".format(legacy_time)
+        print("{:>8} {:>10.2f} {:>12} {:>10} {:>12}".format(num_nodes, packed_time, packed_overlapping, legacy_time, legacy_overlapping))
@@ -0,0 +1,79 @@
+'''
+Benchmark: random against packed network layouts in visual.py.
+
+Usage:
+    python benchmarks/bench_packed_layout.py [--lcrs 1000 5000 20000] [--cluster-size 2]
+
+Builds a network of N synthetic LCRs (clusters named after their top letters, so
+a few clusters hold most LCRs) and times Network.layout with the random
+placement of layout.py and with the packed layout of assets.circlify, then the
+drawing of the gcs image. Reports how many single nodes overlap another one in
+each layout.
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import composition
+import visual
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def synthetic_network(num_lcrs, cluster_size, seed=0):
+    rng = random.Random(seed)
+    # Skewed letter frequencies, like real low-complexity regions
+    weights = [rng.paretovariate(1.0) for _ in AMINO_ACIDS]
+    network = visual.Network()
+    for lcr in range(num_lcrs):
+        length = rng.randint(12, 60)
+        culled_str = "".join(rng.choices(AMINO_ACIDS, weights, k=length))
+        stats = composition.CompositionStats.from_strings([culled_str])
+        network.insert("P{}.{}".format(lcr // 3, lcr % 3 + 1), stats.cluster_key(0, cluster_size), culled_str)
+    return network
+
+def overlapping_single_nodes(network):
+    '''Single nodes overlapping another one (centers closer than the sum of the radii)
+    '''
+    nodes = [single_node for group_node in network.group_nodes.values()
+             for cluster_node in group_node.cluster_nodes.values()
+             for single_node in cluster_node.single_nodes.values()]
+    centers = np.array([node.center for node in nodes])
+    radii = np.array([node.radius for node in nodes])
+    overlapping = np.zeros(len(nodes), dtype=bool)
+    for start in range(0, len(nodes), 1000):
+        dist = np.hypot(*(centers[start:start + 1000, None, :] - centers[None, :, :]).transpose(2, 0, 1))
+        close = dist < (radii[start:start + 1000, None] + radii[None, :]) * (1 - 1e-9)
+        close[np.arange(len(close)), np.arange(start, start + len(close))] = False
+        overlapping[start:start + 1000] = close.any(axis=1)
+    return int(overlapping.sum())
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Network layout benchmark.")
+    parser.add_argument("--lcrs", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--cluster-size", type=int, default=2)
+    args = parser.parse_args()
+
+    print("{:>8} {:>9} {:>8} {:>10} {:>12} {:>8}".format("lcrs", "clusters", "layout", "layout s", "overlapping", "draw s"))
+    for num_lcrs in args.lcrs:
+        network = synthetic_network(num_lcrs, args.cluster_size)
+        num_clusters = sum(len(group_node.cluster_nodes) for group_node in network.group_nodes.values())
+        for mode in ["random", "packed"]:
+            # The random layout prints how many circles found no free space
+            with contextlib.redirect_stdout(io.StringIO()):
+                layout_time, _ = timed(lambda: network.layout(mode=mode))
+            draw_time, _ = timed(lambda: network.draw("gcs", layout_mode=mode))
+            print("{:>8} {:>9} {:>8} {:>10.2f} {:>12} {:>8.2f}".format(
+                num_lcrs, num_clusters, mode, layout_time, overlapping_single_nodes(network), draw_time))
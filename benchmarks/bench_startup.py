@@ -0,0 +1,59 @@
+'''
+Benchmark: startup cost of the main.py and visual.py entry points.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat N] [--top N]
+
+Imports each entry point under `python -X importtime` (fresh interpreter every
+time), reports the best cumulative import time and the heaviest imports, and
+times `--help`. Heavy dependencies (matplotlib, pandas, PIL) should not show up
+here, they are imported by the code paths that use them.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["main", "visual"]
+HEAVY = ["matplotlib", "pandas", "PIL"]
+
+def import_times(module):
+    '''Cumulative import time (us) of every module imported by "import module"
+    '''
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def help_time(module):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, module + ".py", "--help"], cwd=ROOT, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup benchmark.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in ENTRY_POINTS:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda times: times[module])
+        help_best = min(help_time(module) for _ in range(args.repeat))
+
+        print("{}.py".format(module))
+        print("  import {:>10.1f} ms (best of {})".format(best[module] / 1000, args.repeat))
+        print("  --help {:>10.1f} ms".format(help_best * 1000))
+        print("  heavy dependencies imported:", [name for name in HEAVY if name in best] or "none")
+
+        heaviest = sorted(((us, name) for name, us in best.items() if name != module), reverse=True)
+        for us, name in heaviest[:args.top]:
+            print("    {:>10.1f} ms  {}".format(us / 1000, name))
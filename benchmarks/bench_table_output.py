@@ -0,0 +1,117 @@
+'''
+Benchmark: csv output tree against the columnar table (main.py --table).
+
+Usage:
+    python benchmarks/bench_table_output.py [--lcrs N] [--per-protein N]
+
+Builds N synthetic LCRs (random low-complexity strings, --per-protein of them
+per protein), writes them as the usual sequences/clusters csvs and as Parquet
+and Feather tables, then reports the size on disk, the write time and the time
+visual.py needs to load every cluster (and a single cluster) from each.
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import composition
+import main
+import sinks
+import visual
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def synthetic_results(num_lcrs, per_protein, seed=0):
+    '''Results shaped like main.process_record output
+    '''
+    rng = random.Random(seed)
+    results = []
+    for protein in range(0, num_lcrs, per_protein):
+        crit_str, crit_range, criteria = [], [], []
+        position = 1
+        for _ in range(min(per_protein, num_lcrs - protein)):
+            letters = rng.sample(AMINO_ACIDS, 3)
+            length = rng.randint(12, 120)
+            crit_str.append("".join(rng.choice(letters) for _ in range(length)))
+            crit_range.append([(position, position + length - 1)])
+            criteria.append(rng.choice(["1", "2", "3", "2+3"]))
+            position += length + rng.randint(10, 50)
+        stats = composition.CompositionStats.from_strings(crit_str)
+        results.append(("sp|B{:06d}|SYN_HUMAN".format(protein), crit_str, crit_range, criteria, stats))
+    return results
+
+def tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return (time.perf_counter() - start) / repeat, value
+
+def write_csvs(out, results):
+    for directory in [("sequences", "by_id"), ("sequences", "by_overall"), ("clusters",)]:
+        os.makedirs(os.path.join(out, *directory))
+    args = argparse.Namespace(out=out, cluster_size=2)
+    overall = composition.CompositionAccumulator()
+    with sinks.CsvSink() as sink:
+        for result in results:
+            main.write_result(args, sink, result, overall)
+
+def read_cluster_csv(path):
+    '''One cluster csv, parsed the way visual.py does
+    '''
+    with open(path, 'r') as f:
+        return [tuple(line.split(",")[:2]) for line in f.readlines()[1:]]
+
+def write_table(path, results):
+    with sinks.TableSink(path) as table:
+        for fid, crit_str, crit_range, criteria, stats in results:
+            fmt_letters = [stats.top_letters(row) for row in range(len(stats))]
+            clusters = [stats.cluster_key(row) for row in range(len(stats))]
+            main.write_table_rows(table, fid, fmt_letters, crit_str, crit_range, criteria, clusters)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar output benchmark.")
+    parser.add_argument("--lcrs", type=int, default=100000)
+    parser.add_argument("--per-protein", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = synthetic_results(args.lcrs, args.per_protein)
+    cluster = results[0][4].cluster_key(0)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        out = os.path.join(workdir, "output")
+        with contextlib.redirect_stdout(io.StringIO()):
+            csv_write, _ = timed(lambda: write_csvs(out, results))
+        cluster_dir = os.path.join(out, "clusters")
+        csv_read, csv_rows = timed(lambda: visual.read_cluster_csvs(cluster_dir), args.repeat)
+        csv_one, _ = timed(lambda: read_cluster_csv(os.path.join(cluster_dir, cluster + ".csv")), args.repeat)
+
+        print("{} LCRs in {} proteins".format(args.lcrs, len(results)))
+        print("{:<10} {:>10} {:>10} {:>12} {:>14}".format("format", "size MB", "write s", "read all s", "one cluster s"))
+        print("{:<10} {:>10.1f} {:>10.2f} {:>12.3f} {:>14.4f}".format(
+            "csv", (tree_size(os.path.join(out, "sequences")) + tree_size(cluster_dir)) / 1e6, csv_write, csv_read, csv_one))
+
+        for fmt in sinks.TableSink.FORMATS:
+            path = os.path.join(workdir, "lcrs." + fmt)
+            table_write, _ = timed(lambda: write_table(path, results))
+            table_read, table_rows = timed(lambda: visual.read_cluster_table(path), args.repeat)
+            table_one, _ = timed(lambda: sinks.read_table(path, columns=["ID", "Sequence"], clusters=[cluster]), args.repeat)
+
+            assert sorted(map(sorted, table_rows.values())) == sorted(map(sorted, csv_rows.values()))
+            print("{:<10} {:>10.1f} {:>10.2f} {:>12.3f} {:>14.4f}".format(
+                fmt, tree_size(path) / 1e6, table_write, table_read, table_one))
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,81 @@
+'''
+Benchmark: peak memory of a full PNG against a Deep Zoom pyramid of tiles (visual.py --out name.dzi).
+
+Usage:
+    python benchmarks/bench_tiles.py [--lcrs 2000 20000] [--cluster-size 4] [--png-max-mp 300]
+
+Builds a network of N synthetic LCRs (larger cluster sizes give more groups,
+so a larger canvas) and saves the gcs image as one PNG and as a pyramid of
+tiles, each in a fresh process, reporting the time and the peak resident
+memory of that process. PNGs are skipped above --png-max-mp megapixels.
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import composition
+import visual
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def synthetic_network(num_lcrs, cluster_size, seed=0):
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.0) for _ in AMINO_ACIDS]
+    network = visual.Network()
+    for lcr in range(num_lcrs):
+        culled_str = "".join(rng.choices(AMINO_ACIDS, weights, k=rng.randint(12, 60)))
+        stats = composition.CompositionStats.from_strings([culled_str])
+        network.insert("P{}.{}".format(lcr // 3, lcr % 3 + 1), stats.cluster_key(0, cluster_size), culled_str)
+    return network
+
+def save(num_lcrs, cluster_size, path):
+    '''Child process: lay out and save, print the time and the peak memory in MB
+    '''
+    network = synthetic_network(num_lcrs, cluster_size)
+    with contextlib.redirect_stdout(io.StringIO()):
+        network.layout()
+    start = time.perf_counter()
+    network.save(path, "gcs")
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiled output benchmark.")
+    parser.add_argument("--lcrs", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("--cluster-size", type=int, default=4)
+    parser.add_argument("--png-max-mp", type=float, default=300)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        save(int(args.child[0]), int(args.child[1]), args.child[2])
+        sys.exit(0)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print("{:>8} {:>7} {:>14} {:>6} {:>8} {:>8}".format("lcrs", "groups", "canvas", "output", "save s", "peak MB"))
+        for num_lcrs in args.lcrs:
+            network = synthetic_network(num_lcrs, args.cluster_size)
+            width, height = network.get_size()
+            for fmt in ["png", "dzi"]:
+                if fmt == "png" and width * height / 1e6 > args.png_max_mp:
+                    print("{:>8} {:>7} {:>14} {:>6} {:>8} {:>8}".format(num_lcrs, len(network.group_nodes), "{}x{}".format(width, height), fmt, "-", "-"))
+                    continue
+                path = os.path.join(workdir, "gcs." + fmt)
+                output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(num_lcrs), str(args.cluster_size), path],
+                                        check=True, capture_output=True, text=True).stdout
+                elapsed, peak = map(float, output.split())
+                print("{:>8} {:>7} {:>14} {:>6} {:>8.2f} {:>8.0f}".format(
+                    num_lcrs, len(network.group_nodes), "{}x{}".format(width, height), fmt, elapsed, peak))
+    finally:
+        shutil.rmtree(workdir)
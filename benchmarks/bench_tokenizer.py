@@ -0,0 +1,85 @@
+'''
+Benchmark: regex based parse_file (previous main.py) against the single-scan tokenizer.
+
+Usage:
+    python benchmarks/bench_tokenizer.py [--repeat N]
+
+Parses the SEG outputs bundled in Validation_proteins.zip with both paths,
+checks that they agree and reports the time per pass.
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import main
+
+def legacy_is_upper(line):
+    upper = line[0].isupper()
+    for char in line:
+        assert(char.isupper() == upper)
+    return upper
+
+def legacy_parse_file(filepath):
+    '''parse_file as it was before tokenize_line: three regex searches and a per-character case check per line
+    '''
+    with open(filepath, 'r') as f:
+        lines = f.read().splitlines()
+
+    fid = main.get_meta(lines[0])
+    logical_lines, ranges = [], []
+    current_line = ""
+
+    def add_current_line(logical_lines, current_line):
+        if current_line != "":
+            if len(logical_lines) > 0 and legacy_is_upper(logical_lines[-1]) == legacy_is_upper(current_line):
+                logical_lines[-1] += current_line
+            else:
+                logical_lines.append(current_line)
+        return logical_lines, ""
+
+    for line in lines[1:]:
+        if main.line_range(line) != None:
+            logical_lines, current_line = add_current_line(logical_lines, current_line)
+            ranges.append(main.parse_range(main.line_range(line)[0]))
+        current_line += main.get_letters(line)
+
+    logical_lines, current_line = add_current_line(logical_lines, current_line)
+    return fid, logical_lines, ranges
+
+def extract_validation(workdir):
+    paths = []
+    with zipfile.ZipFile(os.path.join(ROOT, "Validation_proteins.zip")) as archive:
+        for name in archive.namelist():
+            if name.startswith("Validation_proteins/validation/") and name.endswith(".txt"):
+                path = os.path.join(workdir, os.path.basename(name))
+                with open(path, "wb") as f:
+                    f.write(archive.read(name))
+                paths.append(path)
+    return sorted(paths)
+
+def timed(parse, paths, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [parse(path) for path in paths]
+    return (time.perf_counter() - start) / repeat, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SEG tokenizer benchmark.")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = extract_validation(workdir)
+        legacy_time, legacy_results = timed(legacy_parse_file, paths, args.repeat)
+        new_time, new_results = timed(main.parse_file, paths, args.repeat)
+
+    print("{} validation files, {} passes".format(len(paths), args.repeat))
+    print("regex parse_file  {:>8.2f} ms/pass".format(legacy_time * 1000))
+    print("tokenize_line     {:>8.2f} ms/pass".format(new_time * 1000))
+    print("speedup           {:>8.1f}x".format(legacy_time / new_time))
+    print("identical output:", legacy_results == new_results)
@@ -0,0 +1,71 @@
+'''
+Benchmark: PNG against streamed SVG/PDF output of visual.py.
+
+Usage:
+    python benchmarks/bench_vector.py [--lcrs 1000 10000 50000] [--layout random]
+
+Builds a network of N synthetic LCRs, computes its layout once, then saves the
+gcs image as PNG (PIL bitmap), SVG and PDF (vector.py). Reports the time of
+each save, the file size and the peak memory allocated by Python while saving
+(tracemalloc, which doesn't see the PIL bitmap: its size is reported apart).
+'''
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import composition
+import vector
+import visual
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def synthetic_network(num_lcrs, seed=0):
+    rng = random.Random(seed)
+    weights = [rng.paretovariate(1.0) for _ in AMINO_ACIDS]
+    network = visual.Network()
+    for lcr in range(num_lcrs):
+        culled_str = "".join(rng.choices(AMINO_ACIDS, weights, k=rng.randint(12, 60)))
+        stats = composition.CompositionStats.from_strings([culled_str])
+        network.insert("P{}.{}".format(lcr // 3, lcr % 3 + 1), stats.cluster_key(0), culled_str)
+    return network
+
+def measured(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vector output benchmark.")
+    parser.add_argument("--lcrs", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--layout", choices=visual.LAYOUT_MODES, default="random")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print("{:>8} {:>12} {:>7} {:>8} {:>9} {:>10}".format("lcrs", "canvas", "format", "save s", "file MB", "python MB"))
+        for num_lcrs in args.lcrs:
+            network = synthetic_network(num_lcrs)
+            with contextlib.redirect_stdout(io.StringIO()):
+                network.layout(mode=args.layout)
+            width, height = network.get_size()
+            for fmt in ["png"] + list(vector.VECTOR_FORMATS):
+                path = os.path.join(workdir, "gcs." + fmt)
+                elapsed, peak = measured(lambda: network.save(path, "gcs", layout_mode=args.layout))
+                print("{:>8} {:>12} {:>7} {:>8.2f} {:>9.2f} {:>10.2f}".format(
+                    num_lcrs, "{}x{}".format(width, height), fmt, elapsed, os.path.getsize(path) / 1e6, peak / 1e6))
+            print("{:>8} {:>12} bitmap of the png: {:.1f} MB".format("", "", width * height * 3 / 1e6))
+    finally:
+        shutil.rmtree(workdir)
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+'''
+RESULT CACHE
+
+On-disk cache of per-file (or per-record) results, so re-runs over the same
+inputs only parse and filter what is new or modified. Entries are keyed by a
+hash of the input content plus the parameters that affect the result, and are
+stored one pickle per entry under <directory>/<first 2 hex digits>/<key>.pkl.
+'''
+# Bump whenever parsing or filtering changes what a result looks like, so old entries are ignored
+CACHE_VERSION = 1
+
+# Returned by get for entries that aren't cached (None is a valid cached result)
+MISS = object()
+
+class ResultCache:
+    '''Results cached on disk, safe to share between worker processes
+    '''
+    def __init__(self, directory, **params):
+        '''
+        Params:
+            directory (str): Cache directory, created if needed
+            params: Everything besides the input that the results depend on (e.g. SEG parameters)
+        '''
+        self.directory = directory
+        self.params = repr((CACHE_VERSION, sorted(params.items()))).encode()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, item):
+        '''Cache key of an input
+        Params:
+            item (str or tuple): Path of an input file (hashed by content) or an in-memory record
+        Return:
+            str: Hex digest
+        '''
+        digest = hashlib.sha256(self.params)
+        if isinstance(item, str):
+            with open(item, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(repr(item).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pkl")
+
+    def get(self, key):
+        '''Cached result, MISS if there is none (or it can't be read)
+        '''
+        try:
+            with open(self.path(key), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return MISS
+        except (EOFError, pickle.UnpicklingError):
+            return MISS
+
+    def put(self, key, value):
+        '''Store a result, written to a temporary file first so readers never see partial entries
+        '''
+        directory = os.path.dirname(self.path(key))
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmppath = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmppath, self.path(key))
+
+class CachedFunction:
+    '''Wraps a per-input function (e.g. main.process_file) with a ResultCache.
+
+    Picklable, so it can be handed to imap_ordered and the lookups, hashing and
+    stores happen in the worker processes.
+    '''
+    def __init__(self, fn, cache):
+        self.fn = fn
+        self.cache = cache
+
+    def __call__(self, item):
+        try:
+            key = self.cache.key(item)
+        except OSError:
+            # Unreadable inputs are left to fn, which reports them as usual
+            return self.fn(item)
+
+        value = self.cache.get(key)
+        if value is MISS:
+            value = self.fn(item)
+            self.cache.put(key, value)
+        return value
@@ -0,0 +1,331 @@
+import itertools
+import string
+import numpy as np
+
+'''
+COMPOSITION COUNTING
+
+Letter counts are fixed 26-slot integer arrays (slot 0 is "A", slot 25 is "Z",
+case is ignored). Strings are encoded with bytes.translate and counted with
+numpy.bincount, so counting never loops over residues in Python.
+'''
+LETTERS = string.ascii_uppercase
+NUM_LETTERS = len(LETTERS)
+
+# Byte -> slot, anything that isn't a letter goes to the extra slot NUM_LETTERS and is dropped
+_SLOTS = bytearray([NUM_LETTERS]) * 256
+for _slot, _letter in enumerate(LETTERS):
+    _SLOTS[ord(_letter)] = _slot
+    _SLOTS[ord(_letter.lower())] = _slot
+_SLOTS = bytes(_SLOTS)
+
+def encode(text):
+    '''Slot of every character of a string
+    Params:
+        text (str): Residues
+    Return:
+        np.ndarray: uint8 array of slots, NUM_LETTERS for characters that aren't letters
+    '''
+    return np.frombuffer(text.encode('ascii', 'replace').translate(_SLOTS), dtype=np.uint8)
+
+def count_letters(text):
+    '''Count frequency of characters in one string
+    Params:
+        text (str): Residues
+    Return:
+        np.ndarray: Counts per letter, shape [26]
+    '''
+    return np.bincount(encode(text), minlength=NUM_LETTERS + 1)[:NUM_LETTERS]
+
+def count_many(strings):
+    '''Count frequency of characters in many strings at once
+    Params:
+        strings (List[str]): Residues, one string per row
+    Return:
+        np.ndarray: Counts per letter, shape [len(strings), 26]
+    '''
+    if len(strings) == 0:
+        return np.zeros((0, NUM_LETTERS), dtype=np.int64)
+
+    slots = encode("".join(strings)).astype(np.intp)
+    rows = np.repeat(np.arange(len(strings)), [len(text) for text in strings])
+    counts = np.bincount(rows * (NUM_LETTERS + 1) + slots, minlength=len(strings) * (NUM_LETTERS + 1))
+    return counts.reshape(len(strings), NUM_LETTERS + 1)[:, :NUM_LETTERS]
+
+def as_counts(letters_freq):
+    '''Counts array from either a counts array or a mapping of letter to frequency
+    Params:
+        letters_freq (np.ndarray or dict{char, int}): Letter counts
+    Return:
+        np.ndarray: Counts per letter, shape [26]
+    '''
+    if isinstance(letters_freq, dict):
+        return np.array([letters_freq.get(letter, 0) for letter in LETTERS], dtype=np.int64)
+    return np.asarray(letters_freq)
+
+def to_dict(counts):
+    '''Mapping of letter to frequency, like the dicts main.py used to build
+    Params:
+        counts (np.ndarray): Counts per letter, shape [26]
+    Return:
+        dict{char, int}: Mapping of character (upper case) to frequency
+    '''
+    return dict(zip(LETTERS, map(int, counts)))
+
+class CompositionAccumulator:
+    '''Running letter counts (e.g. over a whole run), added to in place
+    '''
+    def __init__(self):
+        self.counts = np.zeros(NUM_LETTERS, dtype=np.int64)
+
+    def add(self, counts):
+        '''Add one counts array, or every row of a 2D array of counts
+        '''
+        counts = np.asarray(counts)
+        if counts.ndim == 2:
+            counts = counts.sum(axis=0)
+        self.counts += counts
+
+    def as_dict(self):
+        return to_dict(self.counts)
+
+'''
+COMPOSITION STATISTICS
+'''
+def _ranking_keys(counts):
+    '''Unique sort keys: higher count first, ties in alphabetical order
+    '''
+    counts = np.asarray(counts, dtype=np.int64)
+    return counts * NUM_LETTERS + (NUM_LETTERS - 1 - np.arange(NUM_LETTERS))
+
+def top_k(counts, k):
+    '''Indices of the k most common letters, without sorting all 26
+    Params:
+        counts (np.ndarray): Counts per letter, shape [26] or [n, 26]
+        k (int): Number of letters
+    Return:
+        np.ndarray: Letter indices, most common first (ties alphabetical), shape [k] or [n, k]
+    '''
+    keys = _ranking_keys(counts)
+    k = min(k, NUM_LETTERS)
+
+    # Partial selection of the top k, then order just those k
+    if k < NUM_LETTERS:
+        top = np.argpartition(-keys, k - 1, axis=-1)[..., :k]
+    else:
+        top = np.broadcast_to(np.arange(NUM_LETTERS), keys.shape)
+    order = np.argsort(-np.take_along_axis(keys, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+def top_k_sum(counts, k):
+    '''Sum of the k largest counts
+    Params:
+        counts (np.ndarray): Counts per letter, shape [26] or [n, 26]
+        k (int): Number of letters
+    Return:
+        int or np.ndarray: Sum per row
+    '''
+    counts = np.asarray(counts)
+    k = min(k, counts.shape[-1])
+    return np.partition(counts, -k, axis=-1)[..., -k:].sum(axis=-1)
+
+def sigfig(num, accuracy=0.01):
+    '''Round number to some accuracy.
+    Params:
+        num (int): Number to round
+        accuracy (float): The accuracy of the rounded number.
+    Return:
+        int: Rounded number.
+    '''
+    multiplier = 1 / accuracy
+    return round(num * multiplier) / multiplier
+
+class CompositionStats:
+    '''Letter statistics of a batch of segments (e.g. the culled strings of a protein).
+
+    Counts and a single partial selection of the top letters are computed once,
+    then the csv rows, cluster names and percentages are all read from them.
+    '''
+    def __init__(self, counts, k=4):
+        '''
+        Params:
+            counts (np.ndarray): Counts per letter, shape [n, 26]
+            k (int): Largest number of top letters needed
+        '''
+        self.counts = np.asarray(counts)
+        self.totals = self.counts.sum(axis=1)
+        self.k = k
+        self.top = top_k(self.counts, k)
+
+    @classmethod
+    def from_strings(cls, strings, k=4):
+        return cls(count_many(strings), k)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def top_letters(self, row, num=4):
+        '''Top letters of one segment with their count and relative percentage
+        Params:
+            row (int): Segment index
+            num (int): The number of characters to return (at most k)
+        Return:
+            List[Tuple(char, int, float)]: None if the segment has no letters
+        '''
+        total = int(self.totals[row])
+        if total == 0:
+            return None
+
+        out = []
+        for index in self.top[row, :num]:
+            freq = int(self.counts[row, index])
+            out.append((LETTERS[index], freq, sigfig(freq/total)))
+        return out
+
+    def cluster_key(self, row, num=2):
+        '''Cluster name of one segment: its top "num" letters, sorted alphabetically
+        '''
+        return "".join(sorted(LETTERS[index] for index in self.top[row, :num]))
+
+    def top_sum(self, row, num=4):
+        '''Combined count of the top "num" letters of one segment
+        '''
+        return int(self.counts[row, self.top[row, :num]].sum())
+
+    def percentages(self, row):
+        '''Percentage of every letter in one segment
+        Return:
+            np.ndarray: shape [26], zeros if the segment has no letters
+        '''
+        total = self.totals[row]
+        return self.counts[row] * 100 / total if total > 0 else np.zeros(NUM_LETTERS)
+
+'''
+SEGMENT INDEX
+'''
+class CompositionIndex:
+    '''Cumulative letter counts over the logical lines of one protein.
+
+    The prefix arrays (row i holds the counts/length of lines[:i]) are built
+    with a single count_many call the first time they are needed, after which
+    the composition of any run of lines is two lookups.
+    '''
+    def __init__(self, lines):
+        self.lines = lines
+        self._prefix = None
+        self._lengths = None
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def prefix(self):
+        if self._prefix is None:
+            self._prefix = np.zeros((len(self.lines) + 1, NUM_LETTERS), dtype=np.int64)
+            np.cumsum(count_many(self.lines), axis=0, out=self._prefix[1:])
+        return self._prefix
+
+    def counts(self, start, end):
+        '''Counts per letter of lines[start:end]
+        '''
+        return self.prefix[end] - self.prefix[start]
+
+    def length(self, start, end):
+        '''Number of residues in lines[start:end]
+        '''
+        if self._lengths == None:
+            self._lengths = list(itertools.accumulate(map(len, self.lines), initial=0))
+        return self._lengths[end] - self._lengths[start]
+
+    def segments(self, uppers):
+        '''One Segment per line
+        Params:
+            uppers (List[bool]): Case of each line
+        Return:
+            List[Segment]
+        '''
+        return [Segment(self, ((line, line + 1),), upper, len(self.lines[line])) for line, upper in enumerate(uppers)]
+
+class Segment:
+    '''Stand-in for the string made of some runs of lines of a CompositionIndex.
+
+    Supports what the criteria need from a str (len, +, isupper/islower) while
+    joining and counting in O(runs * 26), independent of the segment lengths.
+    str() builds the actual string.
+    '''
+    __slots__ = ("index", "spans", "upper", "length")
+
+    def __init__(self, index, spans, upper, length=None):
+        '''
+        Params:
+            index (CompositionIndex): Protein the spans point into
+            spans (Tuple[(int, int)]): First and last (exclusive) line of each run
+            upper (bool): Case of the segment, None if mixed
+            length (int): Number of residues, computed from the spans if not given
+        '''
+        self.index = index
+        self.spans = spans
+        self.upper = upper
+        if length == None:
+            length = sum(index.length(start, end) for start, end in spans)
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __add__(self, other):
+        if isinstance(other, str):
+            if other == "":
+                return self
+            return str(self) + other
+
+        # Runs that touch are merged, so adjacent segments stay a single run
+        if self.spans[-1][1] == other.spans[0][0]:
+            spans = self.spans[:-1] + ((self.spans[-1][0], other.spans[0][1]),) + other.spans[1:]
+        else:
+            spans = self.spans + other.spans
+        upper = self.upper if self.upper == other.upper else None
+        return Segment(self.index, spans, upper, self.length + other.length)
+
+    def __radd__(self, other):
+        if other == "":
+            return self
+        return other + str(self)
+
+    def __str__(self):
+        return "".join("".join(self.index.lines[start:end]) for start, end in self.spans)
+
+    def isupper(self):
+        return self.upper == True
+
+    def islower(self):
+        return self.upper == False
+
+    def counts(self):
+        '''Counts per letter of the segment
+        Return:
+            np.ndarray: shape [26]
+        '''
+        return segment_counts([self])
+
+def segment_counts(segments):
+    '''Combined counts per letter of segments of the same CompositionIndex, in any order
+    Params:
+        segments (List[Segment]): Segments to count
+    Return:
+        np.ndarray: shape [26]
+    '''
+    index = segments[0].index
+    spans = sorted(span for segment in segments for span in segment.spans)
+
+    # Neighbouring runs are looked up as one, whatever order the segments came in
+    counts = np.zeros(NUM_LETTERS, dtype=np.int64)
+    start, end = spans[0]
+    for next_start, next_end in spans[1:]:
+        if next_start == end:
+            end = next_end
+            continue
+        counts += index.counts(start, end)
+        start, end = next_start, next_end
+    counts += index.counts(start, end)
+    return counts
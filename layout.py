@@ -0,0 +1,303 @@
+import math
+
+import numpy as np
+
+'''
+NETWORK LAYOUT
+
+Positions of the group, cluster and single node circles drawn by visual.py.
+Circles are placed one at a time inside their container: a batch of candidate
+centers is drawn at once from a seeded generator, checked against the circles
+already placed in a uniform grid, and the first candidate that overlaps
+nothing is kept. If every candidate overlaps, the last one is kept and counted,
+so crowded layouts are reported instead of drawn silently.
+'''
+# Candidate centers drawn per circle
+TRIES = 100
+
+# Circles per cell checked before the others (see CircleGrid.overlapping)
+FIRST_SLOTS = 4
+
+class CircleGrid:
+    '''Uniform grid of placed circles, so overlap checks only look at circles near the candidates.
+
+    Cells are as wide as the largest circle, every circle that can overlap a
+    candidate is then in the 3x3 cells around it. Each cell holds the indices
+    of the circles centered in it (the capacity per cell grows when needed).
+    '''
+    def __init__(self, bounds, max_radius, capacity=4):
+        '''
+        Params:
+            bounds (Tuple[float, float, float, float]): xmin, xmax, ymin, ymax of every center placed
+            max_radius (float): Largest radius placed
+            capacity (int): Initial number of circles per cell
+        '''
+        xmin, xmax, ymin, ymax = bounds
+        self.origin = (xmin, ymin)
+        # Never more than 1024 cells a side, even for circles much smaller than the rectangle
+        self.cell_size = max(2 * max_radius, (xmax - xmin) / 1024, (ymax - ymin) / 1024, 1e-9)
+        self.max_radius = max_radius
+        shape = (int((xmax - xmin) / self.cell_size) + 1, int((ymax - ymin) / self.cell_size) + 1)
+
+        self.cells = np.full(shape + (capacity,), -1, dtype=np.int64)
+        self.fill = np.zeros(shape, dtype=np.int64)
+
+        # Circles placed so far, in the first "count" slots
+        self.count = 0
+        self.xs = np.zeros(64)
+        self.ys = np.zeros(64)
+        self.radii = np.zeros(64)
+
+    def cell_of(self, xs, ys):
+        cols = np.floor((xs - self.origin[0]) / self.cell_size).astype(np.int64)
+        rows = np.floor((ys - self.origin[1]) / self.cell_size).astype(np.int64)
+        return cols, rows
+
+    def neighbors(self, xs, ys, first=0, last=None):
+        '''Pairs of a candidate and a circle placed in one of the 3x3 cells around it, grouped by candidate
+        Params:
+            xs, ys (np.ndarray): Candidate centers
+            first, last (int): Slots of each cell looked at (circles in the order they were added to it), None for all
+        Return:
+            Tuple[np.ndarray, np.ndarray]: Index of the candidate and of the circle of each pair
+        '''
+        cols, rows = self.cell_of(xs, ys)
+        offsets = np.array([-1, 0, 1])
+        cols = (cols[:, None] + offsets[None, :])[:, :, None].repeat(3, axis=2).ravel()
+        rows = (rows[:, None] + offsets[None, :])[:, None, :].repeat(3, axis=1).ravel()
+        valid = (cols >= 0) & (cols < self.cells.shape[0]) & (rows >= 0) & (rows < self.cells.shape[1])
+
+        # Only the circles actually in each cell, crowded cells don't make every lookup longer
+        fill = np.where(valid, self.fill[np.where(valid, cols, 0), np.where(valid, rows, 0)], 0)
+        counts = np.clip(fill if last == None else np.minimum(fill, last), first, None) - first
+        pairs = np.repeat(np.arange(len(counts)), counts)
+        slots = first + np.arange(len(pairs)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return pairs // 9, self.cells[cols[pairs], rows[pairs], slots]
+
+    def overlapping(self, xs, ys, radius):
+        '''Whether each candidate overlaps a circle placed
+        '''
+        # The first circles of each cell first: in crowded areas (where circles kept without free space pile
+        # up) they already overlap nearly every candidate, and only the others are checked against the rest
+        overlapping = np.zeros(len(xs), dtype=bool)
+        rest = np.arange(len(xs))
+        for first, last in [(0, FIRST_SLOTS), (FIRST_SLOTS, None)]:
+            candidates, circles = self.neighbors(xs[rest], ys[rest], first, last)
+            dist = np.hypot(self.xs[circles] - xs[rest][candidates], self.ys[circles] - ys[rest][candidates])
+            overlapping[rest[candidates[dist < radius + self.radii[circles]]]] = True
+            rest = rest[~overlapping[rest]]
+            if len(rest) == 0 or self.cells.shape[2] <= FIRST_SLOTS:
+                break
+        return overlapping
+
+    def covered(self, x, y, radius):
+        '''Whether a circle is inside one already placed, any candidate overlapping it then overlaps that one too
+        '''
+        _, circles = self.neighbors(np.array([x]), np.array([y]))
+        dist = np.hypot(self.xs[circles] - x, self.ys[circles] - y)
+        return bool((dist + radius <= self.radii[circles]).any())
+
+    def add(self, x, y, radius):
+        if self.count == len(self.xs):
+            self.xs, self.ys, self.radii = (np.resize(values, 2 * len(values)) for values in (self.xs, self.ys, self.radii))
+        index = self.count
+        self.xs[index], self.ys[index], self.radii[index] = x, y, radius
+        self.count += 1
+
+        cols, rows = self.cell_of(np.array([x]), np.array([y]))
+        col = min(max(int(cols[0]), 0), self.cells.shape[0] - 1)
+        row = min(max(int(rows[0]), 0), self.cells.shape[1] - 1)
+        if self.fill[col, row] == self.cells.shape[2]:
+            extra = np.full(self.cells.shape, -1, dtype=np.int64)
+            self.cells = np.concatenate([self.cells, extra], axis=2)
+        self.cells[col, row, self.fill[col, row]] = index
+        self.fill[col, row] += 1
+
+class CirclePacker(CircleGrid):
+    '''Circles placed one at a time among candidates, inside a rectangle.
+
+    Circles kept without free space are added too, they are drawn and later
+    circles must stay clear of them, unless they are inside a circle already
+    placed (e.g. piled at the same center), which then stands for them.
+    '''
+    def place(self, xs, ys, radius, inside=None):
+        '''Keep the first candidate that overlaps nothing (the last one if there is none)
+        Params:
+            xs, ys (np.ndarray): Candidate centers, in order of preference
+            radius (float): Radius of the circle
+            inside (np.ndarray): Whether each candidate fits in the canvas, None if they all do
+        Return:
+            Tuple[Tuple[float, float], bool]: Center kept, and whether it overlaps nothing
+        '''
+        acceptable = ~self.overlapping(xs, ys, radius)
+        if inside is not None:
+            acceptable &= inside
+
+        free = bool(acceptable.any())
+        chosen = int(np.argmax(acceptable)) if free else len(xs) - 1
+        x, y = float(xs[chosen]), float(ys[chosen])
+        if free or not self.covered(x, y, radius):
+            self.add(x, y, radius)
+        return (x, y), free
+
+def ring_candidates(rng, center, min_radius, max_radius, tries=TRIES):
+    '''Random centers at a uniform distance between min_radius and max_radius of center, uniform angle
+    '''
+    distances = min_radius + (max_radius - min_radius) * rng.random(tries)
+    angles = rng.random(tries) * (2 * math.pi)
+    return center[0] + distances * np.cos(angles), center[1] + distances * np.sin(angles)
+
+def pack_in_circle(rng, center, container_radius, radii, distances=None):
+    '''Place circles inside a circle, in order
+    Params:
+        rng (np.random.Generator): Random generator of the layout
+        center (Tuple[float, float]): Center of the container
+        container_radius (float): Radius of the container
+        radii (List[float]): Radius of each circle
+        distances (List[float]): Fixed distance of each circle to the center, None for anywhere inside
+    Return:
+        Tuple[List[Tuple[float, float]], int]: Center of each circle, and how many were kept without free space
+    '''
+    if len(radii) == 0:
+        return [], 0
+
+    max_radius = max(radii)
+    bounds = (center[0] - container_radius, center[0] + container_radius, center[1] - container_radius, center[1] + container_radius)
+    packer = CirclePacker(bounds, max_radius)
+
+    centers, overlapping = [], 0
+    for index, radius in enumerate(radii):
+        if distances == None:
+            xs, ys = ring_candidates(rng, center, 0, max(container_radius - radius, 0))
+        else:
+            xs, ys = ring_candidates(rng, center, distances[index], distances[index])
+            if distances[index] == 0:
+                # Every candidate is the center
+                xs, ys = xs[:1], ys[:1]
+        position, free = packer.place(xs, ys, radius)
+        centers.append(position)
+        overlapping += not free
+    return centers, overlapping
+
+def pack_in_rectangle(rng, bounds, radii):
+    '''Place circles inside a rectangle (the canvas), in order
+    Params:
+        rng (np.random.Generator): Random generator of the layout
+        bounds (Tuple[float, float, float, float]): xmin, xmax, ymin, ymax the circles must stay in
+        radii (List[float]): Radius of each circle
+    Return:
+        Tuple[List[Tuple[float, float]], int]: Center of each circle, and how many were kept without free space inside the border
+    '''
+    if len(radii) == 0:
+        return [], 0
+
+    xmin, xmax, ymin, ymax = bounds
+    packer = CirclePacker(bounds, max(radii))
+
+    centers, overlapping = [], 0
+    for radius in radii:
+        xs = xmin + (xmax - xmin) * rng.random(TRIES)
+        ys = ymin + (ymax - ymin) * rng.random(TRIES)
+        inside = (xs - radius >= xmin) & (xs + radius <= xmax) & (ys - radius >= ymin) & (ys + radius <= ymax)
+        position, free = packer.place(xs, ys, radius, inside)
+        centers.append(position)
+        overlapping += not free
+    return centers, overlapping
+
+'''
+EDGES
+'''
+# Opacity of one edge, overlapping edges add up like translucent lines drawn over each other
+EDGE_ALPHA = 60
+
+def minimum_spanning_tree(points):
+    '''Euclidean minimum spanning tree (Prim's algorithm, k^2 distances)
+    Params:
+        points (np.ndarray): shape [k, 2]
+    Return:
+        np.ndarray: Index pairs of the k - 1 edges, shape [k - 1, 2]
+    '''
+    num_points = len(points)
+    in_tree = np.zeros(num_points, dtype=bool)
+    in_tree[0] = True
+    # Distance of every point to the tree, and the tree point it is closest to
+    best = np.hypot(*(points - points[0]).T)
+    parent = np.zeros(num_points, dtype=np.int64)
+
+    pairs = np.zeros((num_points - 1, 2), dtype=np.int64)
+    for edge in range(num_points - 1):
+        nearest = int(np.argmin(np.where(in_tree, np.inf, best)))
+        pairs[edge] = (parent[nearest], nearest)
+        in_tree[nearest] = True
+
+        dist = np.hypot(*(points - points[nearest]).T)
+        closer = dist < best
+        best[closer] = dist[closer]
+        parent[closer] = nearest
+    return pairs
+
+def protein_edges(points, mode="all"):
+    '''Edges between the nodes of one protein
+    Params:
+        points (np.ndarray): Node centers, shape [k, 2]
+        mode (str): One of visual.EDGE_MODES
+    Return:
+        np.ndarray: Index pairs, shape [edges, 2]
+    '''
+    num_points = len(points)
+    if num_points <= 1 or mode == "none":
+        return np.zeros((0, 2), dtype=np.int64)
+    if mode == "all":
+        return np.stack(np.triu_indices(num_points, 1), axis=1)
+    if mode == "star":
+        return np.stack([np.zeros(num_points - 1, dtype=np.int64), np.arange(1, num_points)], axis=1)
+    return minimum_spanning_tree(points)
+
+def network_edges(fid_to_location, mode="all", max_edges=None):
+    '''Segments to draw between nodes of the same protein, each drawn once however many edges it bundles
+    Params:
+        fid_to_location (dict{str, List[Tuple[float, float]]}): Node centers of each protein
+        mode (str): One of visual.EDGE_MODES
+        max_edges (int): Proteins that would get more edges than this are drawn as a minimum spanning tree, None for no cap
+    Return:
+        Tuple[np.ndarray, np.ndarray]: Segments (x1, y1, x2, y2) rounded to pixels, shape [n, 4], and the number of edges of each
+    '''
+    segments = [np.zeros((0, 4))]
+    for centers in fid_to_location.values():
+        points = np.asarray(centers, dtype=float)
+        protein_mode = mode
+        if mode == "all" and max_edges != None and len(points) * (len(points) - 1) // 2 > max_edges:
+            protein_mode = "mst"
+        pairs = protein_edges(points, protein_mode)
+        segments.append(np.concatenate([points[pairs[:, 0]], points[pairs[:, 1]]], axis=1))
+    segments = np.round(np.concatenate(segments))
+
+    # Same endpoints in either direction are the same segment
+    swap = (segments[:, 0] > segments[:, 2]) | ((segments[:, 0] == segments[:, 2]) & (segments[:, 1] > segments[:, 3]))
+    segments[swap] = segments[swap][:, [2, 3, 0, 1]]
+    if len(segments) == 0:
+        return segments, np.zeros(0, dtype=np.int64)
+    return np.unique(segments, axis=0, return_counts=True)
+
+def edge_alpha(counts):
+    '''Opacity of segments bundling "counts" edges, as if each edge was drawn with EDGE_ALPHA
+    '''
+    return np.round(255 * (1 - (1 - EDGE_ALPHA / 255) ** np.asarray(counts))).astype(np.int64)
+
+'''
+PACKED LAYOUT
+'''
+def pack_hierarchy(data, center, radius):
+    '''Non-overlapping circles nested like data, with areas proportional to their datum, in one deterministic pass
+    Params:
+        data (List[dict]): {"id", "datum", "children"} of each top level circle, children given the same way (assets.circlify)
+        center (Tuple[float, float]): Center of the circle enclosing everything
+        radius (float): Radius of the circle enclosing everything
+    Return:
+        dict{object, Tuple[Tuple[float, float], float]}: Center and radius of the circle of each id
+    '''
+    from assets import circlify
+
+    target = circlify.Circle(x=center[0], y=center[1], r=radius, level=0)
+    circles = circlify.circlify(data, target_enclosure=target)
+    return {circle.ex["id"]: ((circle.x, circle.y), circle.r) for circle in circles}
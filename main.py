@@ -1,24 +1,61 @@
 import re
-import string
 import csv
 import os
 import argparse
 import shutil
-import matplotlib.pyplot as plt
+import gzip
+import io
 import sys
+import collections
+import itertools
+import multiprocessing
+import functools
+import contextlib
+import seg
+import composition
+import plots
+import cache
+from sinks import CsvSink, ClusterSink, TableSink
 '''
 FUNCTIONS FOR GETTING INPUTS
 '''
 def parse_args():
     parser = argparse.ArgumentParser(description="Analysis program.")
-    parser.add_argument("input", help="Directory containing all input files")
+    parser.add_argument("input", help="Directory containing all input files, or a single SEG output file with many records (may be gzipped)")
     parser.add_argument("--out", help="Directory to place all output files", default="output")
+    parser.add_argument("--fasta", help="Input is FASTA, low-complexity regions are masked in-process instead of by the seg program", action="store_true")
+    parser.add_argument("--seg-window", help="SEG trigger window length (with --fasta)", type=int, default=seg.WINDOW)
+    parser.add_argument("--seg-locut", help="SEG trigger complexity (with --fasta)", type=float, default=seg.LOCUT)
+    parser.add_argument("--seg-hicut", help="SEG extension complexity (with --fasta)", type=float, default=seg.HICUT)
+    parser.add_argument("--jobs", help="Number of worker processes for parsing and filtering (0 uses all CPUs)", type=int, default=1)
+    parser.add_argument("--cache", help="Directory of cached per-file (per-record for a single input file) results, re-runs only process new or modified inputs", default=None)
+    parser.add_argument("--table", help="Also write every culled string to one columnar table (lcrs.parquet or lcrs.feather) in the output directory", choices=TableSink.FORMATS, default=None)
+    parser.add_argument("--cluster-size", help="Number of most common letters naming a cluster (1 to 4)", type=int, default=2)
+    parser.add_argument("--graphs", help="Bar graphs to draw: none, only the overall graph, or all (one per protein as well)", choices=plots.GRAPH_MODES, default="all")
+    parser.add_argument("--graph-jobs", help="Number of background processes drawing bar graphs (0 draws them in the main process)", type=int, default=1)
+
+    # What to do with an existing output directory (without any of these the user is asked)
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument("--overwrite", help="Delete an existing output directory without asking", dest="mode", action="store_const", const="overwrite")
+    existing.add_argument("--append", help="Add the results to an existing output directory", dest="mode", action="store_const", const="append")
+    existing.add_argument("--resume", help="Continue an interrupted run, skipping proteins whose per-id csv already exists", dest="mode", action="store_const", const="resume")
     args = parser.parse_args()
 
-    # Check if output directory is safe to delete
-    if not output_dir(args.out):
+    if args.seg_window < 1 or args.seg_locut > args.seg_hicut:
+        parser.error("--seg-window must be positive and --seg-locut can't be above --seg-hicut")
+    if args.jobs < 0 or args.graph_jobs < 0:
+        parser.error("--jobs and --graph-jobs must be 0 or a positive integer")
+    if args.cluster_size < 1 or args.cluster_size > 4:
+        parser.error("--cluster-size must be between 1 and 4, the number of top letters kept per culled string")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.table != None and args.mode in ("append", "resume"):
+        parser.error("--table can't be combined with --append or --resume, the table is rewritten by every run")
+
+    # Check if output directory is safe to delete, a refused run exits with an error status (batch schedulers see it failed)
+    if not output_dir(args.out, args.mode):
         print("Halting...")
-        exit()
+        sys.exit(1)
 
     return args
 
@@ -68,62 +105,168 @@ def get_letters(line):
 
     return ""
 
-def add_current_line(logical_lines, current_line):
-    '''Add line to list
+def is_range(token):
+    '''Checks whether a whitespace separated token is a line range (e.g. 123-234)
     Params:
-        logical_lines (list[str]): List of all "logical" lines
-        current_line (str): Logical line to add into the list
+        token (str): A token without whitespace
     Return:
-        (list[str], str): List with new line appended and an empty current_line
+        bool: True if token is a line range
     '''
-    if current_line != "":
-        if len(logical_lines) > 0 and is_upper(logical_lines[-1]) == is_upper(current_line):
-            # If last case same as current case, just append it (same logical line)
-            logical_lines[-1] += current_line
-        else:
-            logical_lines.append(current_line)
+    start, dash, end = token.partition('-')
+    return dash == '-' and start.isdecimal() and end.isdecimal()
 
-    current_line = ""
-    return logical_lines, current_line
+def parse_range(range_str):
+    '''Gets the positions of a line range string
+    Params:
+        range_str (str): line range string (e.g. 123-234)
+    Return:
+        (int, int): First and last position of the range
+    '''
+    start, _, end = range_str.partition('-')
+    return int(start), int(end)
 
-def parse_file(filepath, verbose=False):
-    '''Get Protein Name, list of lines, and list of ranges from a file
+def tokenize_line(line):
+    '''Gets line range string and letters from a line in a single scan, without regular expressions
     Params:
-        filepath (str): Path to input file
-        verbose (bool): Flag for outputting log messages
+        line (str): A single line (newline separated) from input
     Return:
-        (str, list[str], list[str]): Protein Name, list of lines, list of ranges
+        (str, str): line range string (None if there is none), all alphabetic characters in the single line
     '''
-    
-    if verbose:
-        print('Reading file "{}"...'.format(filepath))
+    range_str, letters = None, ""
+
+    # SEG tree-format lines only hold whitespace separated residue runs and ranges
+    for token in line.split():
+        if token.isalpha() and token.isascii():
+            if letters == "":
+                letters = token
+        elif is_range(token):
+            if range_str == None:
+                range_str = token
+        else:
+            # Anything unexpected goes through the general (regex) path
+            search_object = line_range(line)
+            return (search_object[0] if search_object != None else None), get_letters(line)
 
+    return range_str, letters
 
-    # Read all raw files
-    with open(filepath, 'r') as f:
-        f_raw = f.read()
-        lines = f_raw.splitlines()
+def add_line_pieces(logical_lines, pieces, last_upper):
+    '''Join the residue runs of one range and add them to the list of logical lines
+    Params:
+        logical_lines (list[str]): List of all "logical" lines
+        pieces (list[str]): Residue runs collected since the last range
+        last_upper (bool): Case of logical_lines[-1], None if the list is empty
+    Return:
+        bool: Case of logical_lines[-1] after adding
+    '''
+    current_line = "".join(pieces)
+    if current_line == "":
+        return last_upper
+
+    upper = is_upper(current_line)
+    if len(logical_lines) > 0 and upper == last_upper:
+        # If last case same as current case, just append it (same logical line)
+        logical_lines[-1] += current_line
+    else:
+        logical_lines.append(current_line)
 
-    # Get Protein Name
-    fid = get_meta(lines[0])
+    return upper
 
-    # Get logical lines and ranges
+def parse_lines(lines):
+    '''Get list of lines and list of ranges from the lines of a single record
+    Params:
+        lines (iterable[str]): Lines (newline separated) following the record's ">" line
+    Return:
+        (list[str], list[(int, int)]): list of lines, list of ranges
+    '''
     logical_lines, ranges = [], []
-    current_line = ""
+    pieces, last_upper = [], None
+
+    for line in lines:
+        tokens = line.split()
+        if len(tokens) == 0:
+            continue
+
+        # Continuation lines (a single residue run) are by far the most common
+        if len(tokens) == 1 and tokens[0].isalpha() and tokens[0].isascii():
+            pieces.append(tokens[0])
+            continue
+
+        range_str, letters = tokenize_line(line)
 
-    for index, line in enumerate(lines[1:]):
         # New logical line and range
-        if line_range(line) != None:
-            logical_lines, current_line = add_current_line(logical_lines, current_line)
-            ranges.append(line_range(line)[0])
+        if range_str != None:
+            last_upper = add_line_pieces(logical_lines, pieces, last_upper)
+            pieces = []
+            ranges.append(parse_range(range_str))
 
         # Add line to current line
-        current_line += get_letters(line)
+        pieces.append(letters)
 
     # Add the final line and range
-    logical_lines, current_line = add_current_line(logical_lines, current_line)
+    add_line_pieces(logical_lines, pieces, last_upper)
+
+    return logical_lines, ranges
+
+def open_seg_file(filepath):
+    '''Open a SEG output file for reading text, transparently handling gzip
+    Params:
+        filepath (str): Path to input file (plain text or gzip-compressed)
+    Return:
+        file: Text mode file object
+    '''
+    f = open(filepath, 'rb')
+    if f.peek(2)[:2] == b'\x1f\x8b':
+        f.close()
+        return gzip.open(filepath, 'rt')
+
+    return io.TextIOWrapper(f)
+
+def iter_records(filepath, verbose=False):
+    '''Stream every record of a SEG output file, one protein at a time
+    Params:
+        filepath (str): Path to input file, may hold any number of ">" records and be gzip-compressed
+        verbose (bool): Flag for outputting log messages
+    Return:
+        generator[(str, list[str], list[(int, int)])]: Protein Name, list of lines, list of ranges for each record
+    Note: Only the lines of the current record are held in memory
+    '''
+    if verbose:
+        print('Reading file "{}"...'.format(filepath))
+
+    with open_seg_file(filepath) as f:
+        header, body = None, []
+
+        for line in f:
+            line = line.rstrip('\r\n')
+
+            if header == None:
+                # File must start with a ">" line
+                get_meta(line)
+                header = line
+                continue
+
+            if line.startswith('>'):
+                yield (get_meta(header),) + parse_lines(body)
+                header, body = line, []
+                continue
+
+            body.append(line)
+
+        if header != None:
+            yield (get_meta(header),) + parse_lines(body)
+
+def parse_file(filepath, verbose=False):
+    '''Get Protein Name, list of lines, and list of ranges from a file
+    Params:
+        filepath (str): Path to input file
+        verbose (bool): Flag for outputting log messages
+    Return:
+        (str, list[str], list[(int, int)]): Protein Name, list of lines, list of ranges of the first record
+    '''
+    for record in iter_records(filepath, verbose):
+        return record
 
-    return fid, logical_lines, ranges
+    raise ValueError('No record found in "{}"'.format(filepath))
 
 '''
 FUNCTIONS TO EXTRACT INFO
@@ -135,11 +278,10 @@ def is_upper(line):
     Return:
         bool: True if line is upper case, False if line is lower case
     '''
-    upper = line[0].isupper()
+    upper = line.isupper()
 
     # Double check that the entire line is the same case
-    for char in line:
-        assert(char.isupper() == upper)
+    assert(upper or line.islower())
 
     return upper
 
@@ -148,15 +290,19 @@ def edge_exception(line_upper, line_lower_1, line_lower_2):
     Condition: 
         HCR/(HCR+LCR) <= 50% 
         Top 4 amino acids within the HCR+LCR stretch >= 50% of the entire amino acids composition of the combined segments.
+    Params:
+        line_upper, line_lower_1, line_lower_2 (Segment or str): Segments, counted through the protein's CompositionIndex
     Return:
         top_aa (float): aggregate percentage of top 4 amino acids
         int: 0 if failed condotion
     """
     if (len(line_upper)/(len(line_lower_1) + len(line_lower_2) + len(line_upper))) <= 0.5:
-        combo_dict = dict.fromkeys((line_upper + line_lower_1 + line_lower_2).lower(),0)
-        for i in (line_upper + line_lower_1 + line_lower_2).lower():
-            combo_dict[i] += 1
-        num = sum(sorted(combo_dict.values(), reverse=True)[:4])
+        lines = [line for line in (line_upper, line_lower_1, line_lower_2) if line != ""]
+        if all(isinstance(line, composition.Segment) for line in lines):
+            counts = composition.segment_counts(lines)
+        else:
+            counts = composition.count_letters("".join(map(str, lines)))
+        num = composition.top_k_sum(counts, 4)
         top_aa = num/(len(line_lower_1) + len(line_lower_2) + len(line_upper))
         return top_aa
     else:
@@ -315,9 +461,11 @@ def criteria_match(logical_lines, ranges):
     """ Matching Criterias
     Params:
         logical_lines (list[str]): List of all "logical" lines
-        ranges (list[str]): List of ranges
+        ranges (list[(int, int)]): List of ranges
     technique:
         Uses a variation of the window sliding technique 
+        Lines are Segments of one CompositionIndex, so merging lines and counting the
+        top 4 amino acids of a window never builds or re-scans the concatenated strings
     Logic:
         Criteria precedence: 3 -> 1 -> 2
         Look at three adjacent segments (line_1 - line_2 - line_3: trio block) and check if block satisfy any criteria:
@@ -328,13 +476,16 @@ def criteria_match(logical_lines, ranges):
             Iterates through the segments until no more new segments available
     Return:
         out_lines (list[str]): List of segments that satisfied the criterions
-        out_range (list[list[str]]): Nested list of strings that denote the positions of the segments
+        out_range (list[list[(int, int)]]): Sorted positions of the segments making up each string
         out_criteria (list[str]): List of the criterions the segments satisfied
 
     Note: This is the main body of the SEG-Filtered Algorithm
     """
     out_lines, out_ranges, out_criterias = [], [], []
 
+    line_index = composition.CompositionIndex(logical_lines)
+    logical_lines = line_index.segments(list(map(is_upper, logical_lines)))
+
     string_1, string_2, string_3 = "", "", ""
     old_string_1, old_string_2, old_string_3 = "", "", ""
     string_ranges = []
@@ -419,13 +570,13 @@ def criteria_match(logical_lines, ranges):
         if matched_2:
             # Since matched_2 only applies to the middle line, previous matches have to be added
             if old_string_1 != "":
-                out_lines.append(old_string_1)
-                out_ranges.append(list(set(string_ranges)))
+                out_lines.append(str(old_string_1))
+                out_ranges.append(sorted(set(string_ranges)))
                 out_criterias.append("+".join(string_criterias))
                 
             if old_string_3 != "":
-                out_lines.append(old_string_3)
-                out_ranges.append(list(set(string_ranges)))
+                out_lines.append(str(old_string_3))
+                out_ranges.append(sorted(set(string_ranges)))
                 out_criterias.append("+".join(string_criterias))
 
             string_ranges = []
@@ -438,8 +589,8 @@ def criteria_match(logical_lines, ranges):
         # Add matches
         for string in [old_string_3, old_string_1, old_string_2]:
             if string != "":
-                out_lines.append(string)
-                out_ranges.append(list(set(string_ranges)))
+                out_lines.append(str(string))
+                out_ranges.append(sorted(set(string_ranges)))
                 out_criterias.append("+".join(string_criterias))
 
         # Reset since no criteria matched
@@ -450,8 +601,8 @@ def criteria_match(logical_lines, ranges):
     # Add matches
     for string in [string_3, string_1, string_2]:
         if string != "":
-            out_lines.append(string)
-            out_ranges.append(list(set(string_ranges)))
+            out_lines.append(str(string))
+            out_ranges.append(sorted(set(string_ranges)))
             out_criterias.append("+".join(string_criterias))
             break
 
@@ -464,62 +615,37 @@ def get_common_letters(lines):
     Return:
         dict{char, int}: Mapping of character (upper case) to frequency
     '''
-    letters_freq = dict.fromkeys(string.ascii_uppercase, 0)
-
-    for line in lines:
-        for char in line:
-            letters_freq[char.upper()] += 1
-
-    return letters_freq
-
-def sigfig(num, accuracy=0.01):
-    '''Round number to some accuracy.
-    Params:
-        num (int): Number to round
-        accuracy (float): The accuracy of the rounded number.
-    Return:
-        int: Rounded number.
-    '''
-    multiplier = 1 / accuracy
-    return round(num * multiplier) / multiplier
+    return composition.to_dict(composition.count_letters("".join(lines)))
 
 def format_common_letters(letters_freq, num=4):
     '''Sort letters for printing
     Params:
-        letters_freq (dict{char, int}): Mapping of character to frequency
+        letters_freq (np.ndarray or dict{char, int}): Counts per letter (see composition.py) or mapping of character to frequency
         num (int): The number of characters to return
     Return:
         List[Tuple(char, int, int)]: List of the top "num" amount of characters, containing info on the count and relative percentage.
     '''
-    # Get total number of chars
-    total = 0
-    for letter in letters_freq:
-        total += letters_freq[letter]
+    stats = composition.CompositionStats([composition.as_counts(letters_freq)], k=num)
+    return stats.top_letters(0, num)
 
-    if total == 0:
-        return None
-
-    sorted_freq = sorted(letters_freq.items(), key=lambda item: item[1], reverse=True)
-
-    # Get percentages of chars
-    out = []
-    for freq in sorted_freq:
-        out.append((freq[0], freq[1], sigfig(freq[1]/total)))
-
-    return out[:num]
+def get_cluster_names(stats, size=2):
+    '''Get cluster name of each culled string
+    Params:
+        stats (CompositionStats): Letter statistics of each culled string
+        size (int): The number of letters in a cluster name (--cluster-size, at most 4)
+    Return:
+        List[str]: Gives top "size" letters in a string for each mapping
+    '''
+    return [stats.cluster_key(row, num=size) for row in range(len(stats))]
 
-def get_cluster_filenames(args, common_letters_list):
+def get_cluster_filenames(args, stats):
     '''Get cluster name for putting into directories
     Params:
-        common_letters_list (List[dict{char, int}]): List of mappings of character to frequency
+        stats (CompositionStats): Letter statistics of each culled string
     Return:
-        List[str]: Gives top 2 letters in a string for each mapping
+        List[str]: Cluster csv of each culled string
     '''
-    fmt_letters_list = list(map(lambda x : format_common_letters(x, num=2), common_letters_list))
-    clusters = []
-    for ll in fmt_letters_list:
-        top_letters = list(map(lambda x: x[0], ll))
-        clusters.append("".join(sorted("".join(top_letters))))
+    clusters = get_cluster_names(stats, args.cluster_size)
 
     f_clusters = []
     for cluster_name in clusters:
@@ -528,6 +654,117 @@ def get_cluster_filenames(args, common_letters_list):
 
     return f_clusters
 
+'''
+FUNCTIONS FOR PROCESSING
+'''
+def process_record(record):
+    '''Filter and count a single parsed record (runs inside worker processes)
+    Params:
+        record ((str, list[str], list[(int, int)])): Protein Name, list of lines, list of ranges
+    Return:
+        (str, List[str], List[List[(int, int)]], List[str], CompositionStats): Protein Name, culled strings, ranges, criterias and letter statistics of the culled strings
+    '''
+    fid, logical_lines, ranges = record
+
+    # Get culled string and range of letters
+    crit_str, crit_range, criteria = criteria_match(logical_lines, ranges)
+
+    # Count for each culled string
+    stats = composition.CompositionStats.from_strings(crit_str)
+
+    return fid, crit_str, crit_range, criteria, stats
+
+def process_file(input_fname, done=frozenset()):
+    '''Parse, filter and count every record of a SEG output file (runs inside worker processes)
+    Params:
+        input_fname (str): Path to input file
+        done (set[str]): Proteins left out without being filtered (finished by an interrupted run, see --resume)
+    Return:
+        List[Tuple]: Result of process_record for each record in the file
+        None: If the file could not be parsed
+    '''
+    try:
+        records = list(iter_records(input_fname))
+    except:
+        return None
+
+    if len(records) == 0:
+        return None
+
+    return [process_record(record) for record in records if record[0] not in done]
+
+def mask_record(fasta_record, window=seg.WINDOW, locut=seg.LOCUT, hicut=seg.HICUT):
+    '''Mask a FASTA record with the built-in SEG, giving what parse_file reads from seg's output
+    Params:
+        fasta_record ((str, str)): ">" line and sequence
+        window (int): SEG trigger window length
+        locut (float): SEG trigger complexity
+        hicut (float): SEG extension complexity
+    Return:
+        (str, list[str], list[(int, int)]): Protein Name, list of lines, list of ranges
+    '''
+    header, sequence = fasta_record
+    logical_lines, ranges = seg.seg_lines(sequence, window, locut, hicut)
+    return get_meta(header), logical_lines, ranges
+
+def process_fasta_record(fasta_record, **seg_params):
+    '''Mask, filter and count a single FASTA record (runs inside worker processes)
+    '''
+    return process_record(mask_record(fasta_record, **seg_params))
+
+def process_fasta_file(input_fname, done=frozenset(), **seg_params):
+    '''Mask, filter and count every record of a FASTA file (runs inside worker processes)
+    Params:
+        input_fname (str): Path to FASTA file
+        done (set[str]): Proteins left out without being masked or filtered (see process_file)
+        seg_params (dict): window, locut and hicut passed to mask_record
+    Return:
+        List[Tuple]: Result of process_record for each record in the file
+        None: If the file could not be parsed
+    '''
+    # Only reading the file can fail on bad input, errors while masking are bugs and are raised
+    try:
+        fasta_records = list(seg.iter_fasta(input_fname))
+    except (ValueError, OSError, UnicodeDecodeError, EOFError):
+        return None
+
+    if len(fasta_records) == 0:
+        return None
+
+    records = [mask_record(fasta_record, **seg_params) for fasta_record in fasta_records if get_meta(fasta_record[0]) not in done]
+    return [process_record(record) for record in records]
+
+def _map_batch(fn, batch):
+    '''Apply fn to every item of a batch (runs inside worker processes)
+    '''
+    return [fn(item) for item in batch]
+
+def imap_ordered(fn, items, jobs=1, chunksize=16):
+    '''Lazily map fn over items, in order, using a pool of worker processes
+    Params:
+        fn (function): Module level function to apply to each item
+        items (iterable): Items to process
+        jobs (int): Number of worker processes, 1 runs everything in this process
+        chunksize (int): Number of items sent to a worker at a time
+    Return:
+        generator: Results of fn, in the same order as items
+    Note: At most 4 batches per worker are in flight, so memory stays bounded for long inputs
+    '''
+    if jobs <= 1:
+        yield from map(fn, items)
+        return
+
+    items = iter(items)
+    pending = collections.deque()
+    with multiprocessing.Pool(jobs) as pool:
+        for batch in iter(lambda: list(itertools.islice(items, chunksize)), []):
+            pending.append(pool.apply_async(_map_batch, (fn, batch)))
+            if len(pending) >= 4 * jobs:
+                yield from pending.popleft().get()
+
+        while pending:
+            yield from pending.popleft().get()
+
 '''
 FUNCTIONS TO OUTPUT
 '''
@@ -559,153 +796,272 @@ def create_dir(directory):
         return
     os.makedirs(directory)
 
-def output_dir(directory):
+def output_dir(directory, mode=None):
     '''Creates all the necessary basic directory structures.
     Params:
         directory (str): Base output directory specified by user
+        mode (str): What to do if the directory exists: "overwrite", "append" or "resume" keep going without asking, None asks the user
     Return:
         bool: True if directories were created successfully, False if there was a fatal error
     '''
     if os.path.exists(directory):
-        if not y_n_prompt(directory):
-            return False
-    os.makedirs(directory)
-    os.makedirs(os.path.join(directory, "sequences", "by_id"))
-    os.makedirs(os.path.join(directory, "sequences", "by_overall"))
+        if mode == "overwrite":
+            print('Clearing directory "{}"...'.format(directory))
+            shutil.rmtree(directory)
+        elif mode == None:
+            # Nobody to answer the prompt (e.g. a batch job)
+            if not sys.stdin.isatty():
+                print('Output directory "{}" already exists, use --overwrite, --append or --resume.'.format(directory))
+                return False
+            if not y_n_prompt(directory):
+                return False
 
-    os.makedirs(os.path.join(directory, "clusters"))
+    create_dir(os.path.join(directory, "sequences", "by_id"))
+    create_dir(os.path.join(directory, "sequences", "by_overall"))
 
-    os.makedirs(os.path.join(directory, "graphs", "by_id"))
-    os.makedirs(os.path.join(directory, "graphs", "by_overall"))
+    create_dir(os.path.join(directory, "clusters"))
+
+    create_dir(os.path.join(directory, "graphs", "by_id"))
+    create_dir(os.path.join(directory, "graphs", "by_overall"))
     return True
 
-def write_line_csv(filepaths, fid, fmt_letters, strings, ranges, criteria, verbose=False):
+def read_sequences(filepath):
+    '''Rows of a csv written by write_line_csv
+    Params:
+        filepath (str): Csv file, may not exist
+    Return:
+        List[List[str]]: Rows without the header
+    '''
+    if not os.path.isfile(filepath):
+        return []
+
+    with open(filepath, 'r', newline='') as f:
+        return list(csv.reader(f))[1:]
+
+def resume_output(args):
+    '''Find the proteins finished by an earlier run and drop rows of unfinished ones
+    Params:
+        args (Dict{str, }): Args from parseargs.
+    Return:
+        set[str]: Protein Names whose per-id csv exists
+    Note: Per-id csvs are written after overall.csv (see CsvSink), so a protein with a per-id csv has all its
+    rows in overall.csv. Rows of the other proteins are removed so they aren't written twice. The cluster csvs
+    are rebuilt from overall.csv (see seed_clusters).
+    '''
+    by_id = os.path.join(args.out, "sequences", "by_id")
+    done = set()
+    for filename in os.listdir(by_id):
+        if filename.endswith(".csv") and not filename.endswith("-summary.csv"):
+            done.add(filename[:-len(".csv")])
+
+    filepath = generate_seq_filenames(args, None)[0]
+    rows = read_sequences(filepath)
+    kept = [row for row in rows if row[0].rsplit(".", 1)[0] in done]
+    if len(kept) != len(rows):
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+            writer.writerows([SEQ_HEADER] + kept)
+
+    return done
+
+def seed_clusters(args, clusters, rows):
+    '''Start the cluster csvs over from the rows already in overall.csv (--append and --resume)
+    Params:
+        args (Dict{str, }): Args from parseargs.
+        clusters (ClusterSink): Cluster rows of the run
+        rows (List[List[str]]): Rows of overall.csv
+    '''
+    cluster_dir = os.path.join(args.out, "clusters")
+    for filename in os.listdir(cluster_dir):
+        os.remove(os.path.join(cluster_dir, filename))
+
+    stats = composition.CompositionStats.from_strings([row[1] for row in rows])
+    for index, cluster in enumerate(get_cluster_names(stats, args.cluster_size)):
+        clusters.add(cluster, rows[index][0].rsplit(".", 1)[0], rows[index], stats.counts[index])
+
+SEQ_HEADER = [
+    "ID", "Sequence", "Ranges", "Criteria",
+    "Common 1", "Count 1", "Percent 1",
+    "Common 2", "Count 2", "Percent 2",
+    "Common 3", "Count 3", "Percent 3",
+    "Common 4", "Count 4", "Percent 4",]
+
+CLUSTER_SUMMARY_HEADER = [
+    "Cluster", "LCRs", "Proteins", "Mean Length", "Mean Cluster Percent",
+    "Common 1", "Count 1", "Percent 1",
+    "Common 2", "Count 2", "Percent 2",
+    "Common 3", "Count 3", "Percent 3",
+    "Common 4", "Count 4", "Percent 4",]
+
+SUMMARY_HEADER = [
+    "ID", 
+    "Common 1", "Count 1", "Percent 1",
+    "Common 2", "Count 2", "Percent 2",
+    "Common 3", "Count 3", "Percent 3",
+    "Common 4", "Count 4", "Percent 4", ]
+
+def write_rows(sink, filepath, header, rows, last=False):
+    '''Queue rows on the sink, or write them straight away if no sink is given
+    Params:
+        sink (CsvSink): Sink shared by the whole run, None to write immediately
+        filepath (str): File to write to
+        header (List[str]): Header written first if the file doesn't exist yet
+        rows (List[List]): Rows to append
+        last (bool): Have the sink write this file after the others (see CsvSink)
+    '''
+    if sink != None:
+        sink.writerows(filepath, header, rows, last)
+        return
+
+    with CsvSink() as temp_sink:
+        temp_sink.writerows(filepath, header, rows)
+
+def format_ranges(ranges):
+    '''Ranges as written in the csvs
+    Params:
+        ranges (List[(int, int)]): Sorted positions
+    Return:
+        str: Comma separated line range strings (e.g. 1-20,34-56)
+    '''
+    return ",".join("{}-{}".format(start, end) for start, end in ranges)
+
+def format_seq_rows(fid, fmt_letters, strings, ranges, criteria):
+    '''Rows of the sequences and cluster csvs
+    Params:
+        fid (str): Protein Name
+        fmt_letters (List[List[Tuple(str, int, float)]]): List of 4 most common letters and metadata per each string
+        strings (List[str]): List of culled strings
+        ranges (List[List[(int, int)]]): List of ranges for each string
+        criteria (List[int]): List of criterias for each string
+    Return:
+        List[List]: One row (see SEQ_HEADER) per culled string
+    '''
+    rows = []
+    for index, letter_dat in enumerate(fmt_letters):
+        ranges_str = format_ranges(ranges[index])
+        fid_indx = "{}.{}".format(fid, index + 1)
+        row = [item for sublist in letter_dat for item in sublist]
+        rows.append([fid_indx, strings[index], ranges_str, criteria[index]] + row)
+    return rows
+
+def write_line_csv(filepaths, fid, fmt_letters, strings, ranges, criteria, verbose=False, sink=None, last=False):
     '''Append a new line to the csv file
     Params:
         filepaths (List[str]): List of filepaths to write to
         fid (str): Protein Name
         fmt_letters (List[List[Tuple(str, int, float)]]): List of 4 most common letters and metadata per each string
         strings (List[str]): List of culled strings
-        ranges (List[str]): List of ranges for each string
+        ranges (List[List[(int, int)]]): List of ranges for each string
         criteria (List[int]): List of criterias for each string
         verbose (Bool): Whether to list error messages.
+        sink (CsvSink): Sink shared by the whole run, None to write immediately
+        last (bool): Have the sink write these files after the others (see CsvSink)
     '''
     if len(strings) < 1:
         return
 
     if verbose:
-        print('Writing to file "{}"...'.format(filepath))
-
-
-    # Add header if file doesn't exist yet
-    for filepath in filepaths:
-        if os.path.isfile(filepath):
-            continue
+        print('Writing to file "{}"...'.format(filepaths))
 
-        with open(filepath, 'w', newline='') as outfile:
-            writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerow([
-                "ID", "Sequence", "Ranges", "Criteria",
-                "Common 1", "Count 1", "Percent 1",
-                "Common 2", "Count 2", "Percent 2",
-                "Common 3", "Count 3", "Percent 3",
-                "Common 4", "Count 4", "Percent 4",])
+    rows = format_seq_rows(fid, fmt_letters, strings, ranges, criteria)
 
     # Append data
     for filepath in filepaths:
-        with open(filepath, 'a+', newline='') as outfile:
-            for index, letter_dat in enumerate(fmt_letters):
-                writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                ranges_str = ",".join(ranges[index])
-                fid_indx = "{}.{}".format(fid, index + 1)
-                row = [item for sublist in letter_dat for item in sublist]
-                writer.writerow([fid_indx, strings[index], ranges_str, criteria[index]] + row)
-
-def write_cluster_line_csv(filepaths, fid, fmt_letters, strings, ranges, criteria, verbose=False):
+        write_rows(sink, filepath, SEQ_HEADER, rows, last)
+
+def write_cluster_line_csv(filepaths, fid, fmt_letters, strings, ranges, criteria, verbose=False, sink=None):
     '''Append a new line to the csv file
     Params:
         filepaths (List[str]): List of filepaths to write to
         fid (str): Protein Name
         fmt_letters (List[List[Tuple(str, int, float)]]): List of 4 most common letters and metadata per each string
         strings (List[str]): List of culled strings
-        ranges (List[str]): List of ranges for each string
+        ranges (List[List[(int, int)]]): List of ranges for each string
         criteria (List[int]): List of criterias for each string
-        cluster (Bool): whether filenames are being passed in a cluster
         verbose (Bool): Whether to list error messages.
+        sink (CsvSink): Sink shared by the whole run, None to write immediately
     '''
     if len(strings) < 1:
         return
 
     if verbose:
-        print('Writing to file "{}"...'.format(filepath))
-
-
-    # Add header if file doesn't exist yet
-    for filepath in filepaths:
-        if os.path.isfile(filepath):
-            continue
+        print('Writing to file "{}"...'.format(filepaths))
 
-        with open(filepath, 'w', newline='') as outfile:
-            writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerow([
-                "ID", "Sequence", "Ranges", "Criteria",
-                "Common 1", "Count 1", "Percent 1",
-                "Common 2", "Count 2", "Percent 2",
-                "Common 3", "Count 3", "Percent 3",
-                "Common 4", "Count 4", "Percent 4",])
+    # Append data, one row per culled string into its own cluster file
+    rows = format_seq_rows(fid, fmt_letters, strings, ranges, criteria)
+    for filepath, row in zip(filepaths, rows):
+        write_rows(sink, filepath, SEQ_HEADER, [row])
 
-    # Append data
-    for index, filepath in enumerate(filepaths):
-        with open(filepath, 'a+', newline='') as outfile:
-            writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            ranges_str = ",".join(ranges[index])
-            fid_indx = "{}.{}".format(fid, index + 1)
-            row = [item for sublist in fmt_letters[index] for item in sublist]
-            writer.writerow([fid_indx, strings[index], ranges_str, criteria[index]] + row)
 
 
-
-def write_summary_line_csv(filepaths, fid, data, verbose=False):
+def write_summary_line_csv(filepaths, fid, data, verbose=False, sink=None):
     '''Append a new line to the csv file for a fid/family count
     Params:
         filepaths (List[str]): List of filepaths to write to
         fid (str): Protein Name
         data (List[List[Tuple(str, int, float)]]): List of 4 most common letters and metadata (wrapped by a list)
         verbose (Bool): Whether to list error messages.
+        sink (CsvSink): Sink shared by the whole run, None to write immediately
     '''
     if verbose:
         print('Writing to file "{}"...'.format(filepaths))
 
-    # Add header if file doesn't exist yet
-    for filepath in filepaths:
-        if os.path.isfile(filepath):
-            continue
+    rows = []
+    for index, letter_dat in enumerate(data):
+        if letter_dat == None:
+            # Header is still written before halting
+            for filepath in filepaths:
+                write_rows(sink, filepath, SUMMARY_HEADER, [])
+            print("Did not detect any regions of Low-Complexity within the dataset.")
+            sys.exit()
+        else:
+            row = [item for sublist in letter_dat for item in sublist]
 
-        with open(filepath, 'w', newline='') as outfile:
-            writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            header = [
-                "ID", 
-                "Common 1", "Count 1", "Percent 1",
-                "Common 2", "Count 2", "Percent 2",
-                "Common 3", "Count 3", "Percent 3",
-                "Common 4", "Count 4", "Percent 4", ]
-            writer.writerow(header)
+            fid_indx = "{}.{}".format(fid, index + 1)
+            row = [fid_indx] + row 
+            rows.append(row)
 
     for filepath in filepaths:
         # Append data
-        with open(filepath, 'a+', newline='') as outfile:
-            for index, letter_dat in enumerate(data):
-                if letter_dat == None:
-                    print("Did not detect any regions of Low-Complexity within the dataset.")
-                    sys.exit()
-                else:
-                    writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-                    row = [item for sublist in letter_dat for item in sublist]
+        write_rows(sink, filepath, SUMMARY_HEADER, rows)
+
 
-                    fid_indx = "{}.{}".format(fid, index + 1)
-                    row = [fid_indx] + row 
-                    writer.writerow(row)
+def write_table_rows(table, fid, fmt_letters, strings, ranges, criteria, clusters):
+    '''Add the culled strings of a protein to the columnar table
+    Params:
+        table (TableSink): Table of the whole run
+        fid (str): Protein Name
+        fmt_letters (List[List[Tuple(str, int, float)]]): List of 4 most common letters and metadata per each string
+        strings (List[str]): List of culled strings
+        ranges (List[List[(int, int)]]): List of ranges for each string
+        criteria (List[int]): List of criterias for each string
+        clusters (List[str]): Cluster name of each string
+    '''
+    for index, letter_dat in enumerate(fmt_letters):
+        row = {
+            "ID": "{}.{}".format(fid, index + 1), "Protein": fid, "Sequence": strings[index],
+            "Ranges": format_ranges(ranges[index]), "Criteria": criteria[index],
+            "Cluster": clusters[index], "Length": len(strings[index])}
+        for num, (letter, count, percent) in enumerate(letter_dat, 1):
+            row["Common {}".format(num)] = letter
+            row["Count {}".format(num)] = count
+            row["Percent {}".format(num)] = percent
+        table.add(row)
+
+def write_cluster_summary_csv(filepath, clusters, sink=None):
+    '''Write one row of statistics per cluster, straight from the ClusterSink (no csv is read back)
+    Params:
+        filepath (str): File to write to
+        clusters (ClusterSink): Cluster rows and statistics of the run
+        sink (CsvSink): Sink shared by the whole run, None to write immediately
+    '''
+    rows = []
+    for cluster, stats in sorted(clusters.stats.items()):
+        letter_dat = format_common_letters(stats.composition.counts)
+        row = [item for sublist in letter_dat for item in sublist]
+        rows.append([cluster, len(stats), len(stats.proteins), composition.sigfig(stats.mean_length()), composition.sigfig(100 * stats.mean_cluster_percent())] + row)
 
+    write_rows(sink, filepath, CLUSTER_SUMMARY_HEADER, rows)
 
 def generate_seq_filenames(args, fid):
     '''Generates all file names for the given sequence.
@@ -729,114 +1085,146 @@ def generate_counts_filenames(args, fid):
     '''
     f_overall = os.path.join(args.out, "sequences", "by_overall", "overall-summary.csv")
     f_fid = os.path.join(args.out, "sequences", "by_id",  str(fid) + "-summary.csv")
-    return [f_overall, f_fid]
+    f_clusters = os.path.join(args.out, "sequences", "by_overall", "clusters-summary.csv")
+    return [f_overall, f_fid, f_clusters]
 
 '''
-FUNCTIONS FOR GRAPHING
+MAIN
 '''
-
-
-def bar_graph(rootpath, data, fid=None, family=None, overall=None):
-    '''Createts bar graph
+def write_result(args, sink, result, overall, graphs=None, table=None, clusters=None, verbose=False):
+    '''Write csvs and graph for one processed record
     Params:
-        rootpath (str): Rootpath of graph directories.
-        data (List[Dict{str, int}]): List of mappinigs from letter to count
+        args (Dict{str, }): Args from parseargs.
+        sink (CsvSink): Sink shared by the whole run
+        result (Tuple): Output of process_record
+        overall (CompositionAccumulator): Running letter counts for the whole run, updated in place
+        graphs (GraphStage): Stage drawing the bar graph of the record, None to skip it
+        table (TableSink): Columnar table of the run, None if there is none
+        clusters (ClusterSink): Cluster rows of the run, None to append to the cluster csvs through sink
+        verbose (bool): Flag for outputting log messages
     '''
-    filepath = os.path.join(rootpath)
-
-    # Combine data for bar graph
-    if fid != None:
-        temp_data = dict.fromkeys(string.ascii_uppercase, 0)
-        for index, dat in enumerate(data):
-            temp_data = {x: dat.get(x) + temp_data.get(x)
-                for x in dat }
-        data = temp_data
-    else:
-        data = data[0]
+    fid, crit_str, crit_range, criteria, stats = result
 
+    if len(crit_str) == 0:
+        return
 
-    if fid != None:
-        title = fid
-    if overall != None:
-        title = overall
-
-    impath = os.path.join(filepath, str(title) + ".jpg")
+    # Add common letters to family and overall
+    overall.add(stats.counts)
 
-    fig = plt.figure(figsize = (9, 7))
-    ax = fig.add_axes([0.1,0.1,0.8,0.8])
-    sorted_dat = sorted(data.items(), key=lambda x: x[1], reverse=True)
-    sorted_dat = list(filter(lambda x: x[1] > 0, sorted_dat))
+    # Create culled strings csv
+    if verbose:
+        print("Creating csv for fid", fid)
+    seq_filenames = generate_seq_filenames(args, fid)
+    fmt_letters_list = [stats.top_letters(row) for row in range(len(stats))]
+    write_line_csv(seq_filenames[:1], fid, fmt_letters_list, crit_str, crit_range, criteria, sink=sink)
 
-    sorted_dat_labels = list(map(lambda x: x[0], sorted_dat))
-    sorted_dat_data = list(map(lambda x: x[1], sorted_dat))
+    # The per-id csv is written after the shared ones, --resume takes it as the sign the protein is done
+    write_line_csv(seq_filenames[1:], fid, fmt_letters_list, crit_str, crit_range, criteria, sink=sink, last=True)
 
+    if clusters == None:
+        cluster_names = get_cluster_filenames(args, stats)
+        write_cluster_line_csv(cluster_names, fid, fmt_letters_list, crit_str, crit_range, criteria, sink=sink)
+    else:
+        rows = format_seq_rows(fid, fmt_letters_list, crit_str, crit_range, criteria)
+        for index, cluster in enumerate(get_cluster_names(stats, args.cluster_size)):
+            clusters.add(cluster, fid, rows[index], stats.counts[index])
 
+    if table != None:
+        write_table_rows(table, fid, fmt_letters_list, crit_str, crit_range, criteria, get_cluster_names(stats, args.cluster_size))
 
-    ax.set_title(title)
-    ax.set_xlabel("Amino acids")
-    ax.set_ylabel("Count")
-    #ax.set_xticks(list(range(len(sorted_dat))))
-    #ax.set_xticklabels(sorted_dat_labels)
-    ax.barh(sorted_dat_labels , sorted_dat_data, color = "lightskyblue")
-    for index, value in enumerate(sorted_dat_data):
-        plt.text(value/2, index, str(value), ha = "center", fontweight = 'bold')
-        plt.text(value, index, "{0:.2f}%".format(100 * value/sum(sorted_dat_data)), fontweight = 'bold')
-    plt.savefig(impath)
-    plt.close()
+    if graphs == None or not graphs.wants():
+        return
 
+    # Creating graph for id
+    if verbose:
+        print("Creating graph for id", fid)
+    f_image = os.path.join(args.out, "graphs", "by_id")
+    graphs.draw(f_image, fid, stats.counts.sum(axis=0))
 
-'''
-MAIN
-'''
 if __name__ == "__main__":
     args = parse_args()
 
-    # Create dict to keep track of most common letters
-    overall_common_letters = dict.fromkeys(string.ascii_uppercase, 0)
-
-    for filename in os.listdir(args.input):
-        input_fname = os.path.join(args.input, filename)
-        try:
-            fid, logical_lines, ranges = parse_file(input_fname)
-        except:
-            print("Invalid file format found: {}".format(filename))
-            continue
-
-        # Get culled string and range of letters
-        crit_str, crit_range, criteria = criteria_match(logical_lines, ranges)
-
-        if len(crit_str) == 0:
-            continue
-
-        # Count for each culled string
-        common_letters_list = []
-        for culled_str in crit_str:
-            common_letters = get_common_letters(culled_str)
-            common_letters_list.append(common_letters)
-
-            # Add common letters to family and overall
-            overall_common_letters = {x: common_letters.get(x) + overall_common_letters.get(x)
-                for x in common_letters }
-
-        # Create culled strings csv
-        print("Creating csv for fid", fid)
-        seq_filenames = generate_seq_filenames(args, fid)
-        fmt_letters_list = list(map(format_common_letters, common_letters_list))
-        write_line_csv(seq_filenames, fid, fmt_letters_list, crit_str, crit_range, criteria)
-
-        cluster_names = get_cluster_filenames(args, common_letters_list)
-        write_cluster_line_csv(cluster_names, fid, fmt_letters_list, crit_str, crit_range, criteria)
-
-        # Creating graph for id
-        print("Creating graph for id", fid)
-        f_image = os.path.join(args.out, "graphs", "by_id")
-        bar_graph(f_image, common_letters_list, fid=fid)
-
-
-    print("Creating graph for overall")
-    counts_filenames = generate_counts_filenames(args, 0)
-    fmt_letters = format_common_letters(overall_common_letters)
-    write_summary_line_csv([counts_filenames[0]], -1, [fmt_letters])
-    f_image = os.path.join(args.out, "graphs",  "by_overall")
-    bar_graph(f_image, [overall_common_letters], overall="overall")
-
+    # Keep track of most common letters
+    overall = composition.CompositionAccumulator()
+
+    # Proteins finished by an interrupted run
+    done = set()
+    if args.mode == "resume":
+        done = resume_output(args)
+
+    # Rows of the cluster csvs, each written once at the end
+    clusters = ClusterSink(os.path.join(args.out, "clusters"), SEQ_HEADER)
+
+    if args.mode in ("append", "resume"):
+        # The summaries and cluster csvs cover every row in the output directory, not just this run's
+        existing = read_sequences(generate_seq_filenames(args, None)[0])
+        overall.add(composition.count_many([row[1] for row in existing]))
+        seed_clusters(args, clusters, existing)
+        for summary_filename in generate_counts_filenames(args, 0)[::2]:
+            if os.path.isfile(summary_filename):
+                os.remove(summary_filename)
+
+    # One sink for the whole run, every csv is flushed in bulk when it closes
+    # Graphs are drawn by their own processes while records are still being filtered
+    if args.table != None:
+        table_sink = TableSink(os.path.join(args.out, "lcrs." + args.table))
+    else:
+        table_sink = contextlib.nullcontext()
+
+    with CsvSink() as sink, clusters, plots.GraphStage(args.graphs, args.graph_jobs) as graphs, table_sink as table:
+        if args.fasta:
+            # Built-in SEG, FASTA goes straight in without the seg program or intermediate files
+            seg_params = {"window": args.seg_window, "locut": args.seg_locut, "hicut": args.seg_hicut}
+            process_file_fn = functools.partial(process_fasta_file, **seg_params)
+            process_record_fn = functools.partial(process_fasta_record, **seg_params)
+            iter_input = seg.iter_fasta
+        else:
+            seg_params = {}
+            process_file_fn, process_record_fn, iter_input = process_file, process_record, iter_records
+
+        if len(done) > 0 and args.cache == None:
+            # Finished proteins are dropped by the workers before being filtered. Cached results are kept whole
+            # for later runs, those of finished proteins are skipped when writing
+            process_file_fn = functools.partial(process_file_fn, done=done)
+
+        if args.cache != None:
+            # Unchanged inputs are read back from the cache instead of being parsed and filtered again
+            result_cache = cache.ResultCache(args.cache, fasta=args.fasta, **seg_params)
+            process_file_fn = cache.CachedFunction(process_file_fn, result_cache)
+            process_record_fn = cache.CachedFunction(process_record_fn, result_cache)
+
+        if os.path.isdir(args.input):
+            filenames = os.listdir(args.input)
+            input_fnames = [os.path.join(args.input, filename) for filename in filenames]
+
+            # Parsing and filtering fan out to the workers, all writes happen here in input order
+            results = imap_ordered(process_file_fn, input_fnames, jobs=args.jobs)
+            for filename, file_results in zip(filenames, results):
+                if file_results == None:
+                    print("Invalid file format found: {}".format(filename))
+                    continue
+
+                for result in file_results:
+                    if result[0] in done:
+                        continue
+                    write_result(args, sink, result, overall, graphs, table, clusters, verbose=True)
+        else:
+            # Single (possibly gzipped) file holding many records, streamed record by record
+            records = iter_input(args.input)
+            if len(done) > 0:
+                # Finished proteins aren't filtered again (FASTA records still hold the ">" line)
+                records = (record for record in records if (get_meta(record[0]) if args.fasta else record[0]) not in done)
+
+            results = imap_ordered(process_record_fn, records, jobs=args.jobs)
+            for result in results:
+                write_result(args, sink, result, overall, graphs, table, clusters, verbose=True)
+
+        counts_filenames = generate_counts_filenames(args, 0)
+        write_cluster_summary_csv(counts_filenames[2], clusters, sink=sink)
+        fmt_letters = format_common_letters(overall.counts)
+        write_summary_line_csv([counts_filenames[0]], -1, [fmt_letters], sink=sink)
+
+        if graphs.wants(overall=True):
+            print("Creating graph for overall")
+            f_image = os.path.join(args.out, "graphs",  "by_overall")
+            graphs.draw(f_image, "overall", overall.counts, overall=True)
@@ -0,0 +1,208 @@
+import argparse
+import collections
+import functools
+import os
+
+import cache
+import composition
+import main
+import plots
+import seg
+
+'''
+IN-MEMORY PIPELINE
+
+Chains SEG masking, the SEG-Filter criteria, composition counting and network
+building without going through directories of text and csv files. Files are
+only written when asked for:
+
+    pipeline = Pipeline.from_fasta(["proteome.fasta.gz"], jobs=8)
+    df = pipeline.to_dataframe()
+    network = pipeline.network()
+    network.draw(network_type="gcs").save("gcs-output.png")
+    pipeline.write("output")
+'''
+
+# One filtered low-complexity region
+LCR = collections.namedtuple("LCR", [
+    "id", "fid", "sequence", "ranges", "criteria", "cluster", "common_letters", "counts"])
+
+def expand_paths(paths):
+    '''List input files, expanding directories the way main.py does
+    Params:
+        paths (str or List[str]): Files and/or directories
+    Return:
+        List[str]: Files
+    '''
+    if isinstance(paths, str):
+        paths = [paths]
+
+    filepaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths += [os.path.join(path, filename) for filename in os.listdir(path)]
+        else:
+            filepaths.append(path)
+    return filepaths
+
+def iter_path_records(paths, iter_file):
+    '''Stream the records of every input file, skipping files that can't be parsed like main.py
+    Params:
+        paths (str or List[str]): Files and/or directories
+        iter_file (function): Record generator for one file (seg.iter_fasta or main.iter_records)
+    Return:
+        generator: Records of every valid file
+    '''
+    for filepath in expand_paths(paths):
+        try:
+            records = list(iter_file(filepath))
+        except:
+            print("Invalid file format found: {}".format(filepath))
+            continue
+        yield from records
+
+class Pipeline:
+    '''FASTA (or SEG output) in, filtered LCRs out, everything kept in memory.
+
+    Records are masked, filtered and counted the first time results are
+    needed (in worker processes when jobs > 1) and kept for every later call.
+    '''
+    def __init__(self, records, masked=True, jobs=1, window=seg.WINDOW, locut=seg.LOCUT, hicut=seg.HICUT, cache_dir=None, cluster_size=2):
+        '''
+        Params:
+            records (iterable): (">" line, sequence) FASTA records, or (fid, logical lines, ranges) if masked
+            masked (bool): Whether records were already masked by SEG
+            jobs (int): Number of worker processes
+            window (int): SEG trigger window length
+            locut (float): SEG trigger complexity
+            hicut (float): SEG extension complexity
+            cache_dir (str): Directory of a ResultCache for per-record results, None to disable
+            cluster_size (int): Number of most common letters naming a cluster (1 to 4)
+        '''
+        self.records = records
+        self.masked = masked
+        self.jobs = jobs
+        self.seg_params = {"window": window, "locut": locut, "hicut": hicut}
+        self.cache_dir = cache_dir
+        self.cluster_size = cluster_size
+        self._results = None
+
+    @classmethod
+    def from_fasta(cls, paths, **kwargs):
+        '''Pipeline over FASTA files (or directories of them), masked by the built-in SEG
+        '''
+        return cls(iter_path_records(paths, seg.iter_fasta), masked=False, **kwargs)
+
+    @classmethod
+    def from_sequences(cls, sequences, **kwargs):
+        '''Pipeline over in-memory sequences
+        Params:
+            sequences (dict{str, str} or iterable[(str, str)]): Mapping or pairs of protein name to sequence
+        '''
+        if isinstance(sequences, dict):
+            sequences = sequences.items()
+        records = ((">" + str(fid), sequence) for fid, sequence in sequences)
+        return cls(records, masked=False, **kwargs)
+
+    @classmethod
+    def from_seg(cls, paths, **kwargs):
+        '''Pipeline over output of the seg program (files or directories)
+        '''
+        return cls(iter_path_records(paths, main.iter_records), masked=True, **kwargs)
+
+    def results(self):
+        '''Per-protein results, see main.process_record
+        Return:
+            List[Tuple]: Protein Name, culled strings, ranges, criterias and letter statistics of the culled strings
+        '''
+        if self._results == None:
+            if self.masked:
+                fn = main.process_record
+            else:
+                fn = functools.partial(main.process_fasta_record, **self.seg_params)
+            if self.cache_dir != None:
+                params = {} if self.masked else self.seg_params
+                fn = cache.CachedFunction(fn, cache.ResultCache(self.cache_dir, fasta=not self.masked, **params))
+            self._results = list(main.imap_ordered(fn, self.records, jobs=self.jobs))
+        return self._results
+
+    def lcrs(self):
+        '''Iterate over every filtered low-complexity region
+        Return:
+            generator[LCR]: One LCR per culled string, in input order
+        '''
+        for fid, crit_str, crit_range, criteria, stats in self.results():
+            clusters = main.get_cluster_names(stats, self.cluster_size)
+            for index, culled_str in enumerate(crit_str):
+                yield LCR(
+                    id="{}.{}".format(fid, index + 1),
+                    fid=fid,
+                    sequence=culled_str,
+                    ranges=crit_range[index],
+                    criteria=criteria[index],
+                    cluster=clusters[index],
+                    common_letters=stats.top_letters(index),
+                    counts=stats.counts[index])
+
+    def overall_counts(self):
+        '''Letter counts over every LCR
+        Return:
+            dict{char, int}: Mapping of character (upper case) to frequency
+        '''
+        overall = composition.CompositionAccumulator()
+        for result in self.results():
+            overall.add(result[4].counts)
+        return overall.as_dict()
+
+    def to_dataframe(self):
+        '''All LCRs as a pandas DataFrame, with the columns of the sequences csvs plus Protein and Cluster
+        '''
+        import pandas as pd
+
+        rows = []
+        for lcr in self.lcrs():
+            row = [item for sublist in lcr.common_letters for item in sublist]
+            rows.append([lcr.id, lcr.sequence, main.format_ranges(lcr.ranges), lcr.criteria] + row + [lcr.fid, lcr.cluster])
+        return pd.DataFrame(rows, columns=main.SEQ_HEADER + ["Protein", "Cluster"])
+
+    def network(self):
+        '''Build the cluster network visual.py draws, straight from memory
+        Return:
+            visual.Network
+        '''
+        import visual
+
+        network = visual.Network()
+        for lcr in self.lcrs():
+            network.insert(lcr.id, lcr.cluster, lcr.sequence)
+        return network
+
+    def write(self, out, graphs=True, graph_jobs=0):
+        '''Materialize the same output tree as main.py
+        Params:
+            out (str): Base output directory, created if needed
+            graphs (bool or str): Whether to draw the bar graphs, or one of plots.GRAPH_MODES
+            graph_jobs (int): Number of background processes drawing the graphs (0 draws them here)
+        '''
+        if isinstance(graphs, bool):
+            graphs = "all" if graphs else "none"
+
+        for directory in [("sequences", "by_id"), ("sequences", "by_overall"), ("clusters",), ("graphs", "by_id"), ("graphs", "by_overall")]:
+            main.create_dir(os.path.join(out, *directory))
+
+        args = argparse.Namespace(out=out, cluster_size=self.cluster_size)
+        overall = composition.CompositionAccumulator()
+        clusters = main.ClusterSink(os.path.join(out, "clusters"), main.SEQ_HEADER)
+        with main.CsvSink() as sink, clusters, plots.GraphStage(graphs, graph_jobs) as stage:
+            for result in self.results():
+                main.write_result(args, sink, result, overall, graphs=stage, clusters=clusters)
+
+            # No LCRs at all: nothing to summarize
+            fmt_letters = main.format_common_letters(overall.counts)
+            if fmt_letters == None:
+                return
+
+            counts_filenames = main.generate_counts_filenames(args, 0)
+            main.write_cluster_summary_csv(counts_filenames[2], clusters, sink=sink)
+            main.write_summary_line_csv([counts_filenames[0]], -1, [fmt_letters], sink=sink)
+            stage.draw(os.path.join(out, "graphs", "by_overall"), "overall", overall.counts, overall=True)
@@ -0,0 +1,143 @@
+import collections
+import multiprocessing
+import os
+
+import composition
+
+'''
+BAR GRAPHS
+
+Letter-count bar graphs for graphs/by_id and graphs/by_overall. A single figure
+is built once per process and its artists are updated for every graph, and a
+GraphStage can hand the drawing to background processes so it stays off the
+parsing/filtering path. matplotlib is only imported once a graph is drawn.
+'''
+# Which graphs get drawn: none, only graphs/by_overall, or every graph
+GRAPH_MODES = ("none", "overall", "all")
+
+class BarGraph:
+    '''Reusable bar graph figure: one bar and two labels per letter, hidden when unused
+    '''
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.fig = Figure(figsize = (9, 7))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_axes([0.1,0.1,0.8,0.8])
+        self.ax.set_xlabel("Amino acids")
+        self.ax.set_ylabel("Count")
+
+        slots = range(composition.NUM_LETTERS)
+        self.bars = self.ax.barh(slots, [0] * composition.NUM_LETTERS, color = "lightskyblue").patches
+        self.count_labels = [self.ax.text(0, index, "", ha = "center", fontweight = 'bold') for index in slots]
+        self.percent_labels = [self.ax.text(0, index, "", fontweight = 'bold') for index in slots]
+
+    def draw(self, impath, title, counts):
+        '''Save the bar graph of one set of letter counts
+        Params:
+            impath (str): Image file to write
+            title (str): Graph title
+            counts (np.ndarray): Counts per letter, shape [26]
+        '''
+        # Most common first (ties alphabetical), letters that don't appear are left out
+        order = [index for index in composition.top_k(counts, composition.NUM_LETTERS) if counts[index] > 0]
+        values = [int(counts[index]) for index in order]
+        total = sum(values)
+
+        for index, (bar, count_label, percent_label) in enumerate(zip(self.bars, self.count_labels, self.percent_labels)):
+            shown = index < len(values)
+            for artist in (bar, count_label, percent_label):
+                artist.set_visible(shown)
+            if not shown:
+                continue
+
+            value = values[index]
+            bar.set_width(value)
+            count_label.set_position((value/2, index))
+            count_label.set_text(str(value))
+            percent_label.set_position((value, index))
+            percent_label.set_text("{0:.2f}%".format(100 * value/total))
+
+        self.ax.set_yticks(range(len(values)))
+        self.ax.set_yticklabels([composition.LETTERS[index] for index in order])
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        self.ax.set_title(title)
+
+        self.fig.savefig(impath)
+
+# Figure of the current process, created on first use
+_bar_graph = None
+
+def draw_bar_graph(impath, title, counts):
+    '''Draw with the figure of the current process
+    '''
+    global _bar_graph
+    if _bar_graph == None:
+        _bar_graph = BarGraph()
+    _bar_graph.draw(impath, title, counts)
+
+class GraphStage:
+    '''Bar graphs of a run, drawn by background processes (or inline if processes is 0).
+
+    At most 4 graphs per process are queued at once, so the caller only waits
+    when drawing falls behind. Worker errors are raised in the caller.
+    '''
+    def __init__(self, mode="all", processes=1):
+        '''
+        Params:
+            mode (str): One of GRAPH_MODES
+            processes (int): Number of drawing processes, 0 to draw in the calling process
+        '''
+        assert(mode in GRAPH_MODES)
+        self.mode = mode
+        self.max_pending = 4 * processes
+        self.pending = collections.deque()
+        self.pool = None
+        if processes > 0 and mode != "none":
+            self.pool = multiprocessing.Pool(processes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def wants(self, overall=False):
+        '''Whether graphs of this kind are drawn
+        '''
+        return self.mode == "all" or (self.mode == "overall" and overall)
+
+    def draw(self, rootpath, title, counts, overall=False):
+        '''Queue one bar graph
+        Params:
+            rootpath (str): Directory of the graph
+            title (str): Graph title, also the file name
+            counts (np.ndarray): Counts per letter, shape [26]
+            overall (bool): Whether this is a graphs/by_overall graph
+        '''
+        if not self.wants(overall):
+            return
+
+        impath = os.path.join(rootpath, str(title) + ".jpg")
+        if self.pool == None:
+            draw_bar_graph(impath, title, counts)
+            return
+
+        self.pending.append(self.pool.apply_async(draw_bar_graph, (impath, title, counts)))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().get()
+
+    def close(self):
+        '''Wait for every queued graph and stop the drawing processes
+        '''
+        if self.pool == None:
+            return
+
+        while len(self.pending) > 0:
+            self.pending.popleft().get()
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
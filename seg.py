@@ -0,0 +1,318 @@
+import gzip
+import io
+import math
+import numpy as np
+
+'''
+NATIVE SEG
+
+Wootton-Federhen SEG low-complexity masking (the algorithm of the ncbi-seg
+program run by seg_scr.sh), computed in-process with NumPy so FASTA files can be
+fed straight into main.py without the external binary or intermediate files.
+'''
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+# ncbi-seg defaults
+WINDOW = 12
+LOCUT = 2.2
+HICUT = 2.5
+MAXTRIM = 100
+
+# Upper bound on the windows scored at once by trim
+_TRIM_BLOCK_ROWS = 200000
+
+# Byte -> residue index, anything that isn't one of the 20 amino acids maps to 20 (not counted)
+_RESIDUE_INDEX = np.full(256, len(AMINO_ACIDS), dtype=np.intp)
+for _index, _letter in enumerate(AMINO_ACIDS):
+    _RESIDUE_INDEX[ord(_letter)] = _index
+    _RESIDUE_INDEX[ord(_letter.lower())] = _index
+
+_LN2 = math.log(2)
+_LN20 = math.log(20)
+
+# ln(n!) lookup table, grown on demand
+_lnfac = np.array([math.lgamma(n + 1) for n in range(256)])
+
+def lnfac(n):
+    '''ln(n!) for an integer or an array of integers
+    '''
+    global _lnfac
+    top = int(np.max(n))
+    if top >= len(_lnfac):
+        _lnfac = np.array([math.lgamma(k + 1) for k in range(2 * top + 1)])
+    return _lnfac[n]
+
+'''
+FUNCTIONS FOR READING FASTA
+'''
+def open_fasta_file(filepath):
+    '''Open a FASTA file for reading text, transparently handling gzip
+    Params:
+        filepath (str): Path to FASTA file (plain text or gzip-compressed)
+    Return:
+        file: Text mode file object
+    '''
+    f = open(filepath, 'rb')
+    if f.peek(2)[:2] == b'\x1f\x8b':
+        f.close()
+        return gzip.open(filepath, 'rt')
+
+    return io.TextIOWrapper(f)
+
+def iter_fasta(filepath):
+    '''Stream every sequence of a FASTA file
+    Params:
+        filepath (str): Path to FASTA file, may hold any number of ">" records and be gzip-compressed
+    Return:
+        generator[(str, str)]: ">" line and sequence of each record
+    '''
+    with open_fasta_file(filepath) as f:
+        header, pieces = None, []
+
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if header != None:
+                    yield header, "".join(pieces)
+                header, pieces = line, []
+            elif header != None:
+                pieces.append(line)
+            elif line != "":
+                raise ValueError('"{}" does not start with a ">" line'.format(filepath))
+
+        if header != None:
+            yield header, "".join(pieces)
+
+'''
+FUNCTIONS FOR COMPLEXITY
+'''
+def prefix_counts(sequence):
+    '''Cumulative residue counts of a sequence
+    Params:
+        sequence (str): Amino acid sequence
+    Return:
+        np.ndarray: Array of shape [len+1, 20], row i holds the counts of sequence[:i]
+    '''
+    codes = _RESIDUE_INDEX[np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)]
+    onehot = np.zeros((len(codes) + 1, len(AMINO_ACIDS) + 1), dtype=np.int32)
+    onehot[np.arange(1, len(codes) + 1), codes] = 1
+    return np.cumsum(onehot, axis=0)[:, :len(AMINO_ACIDS)]
+
+def entropy(counts):
+    '''Compositional complexity (Shannon entropy, bits) of each row of counts
+    Params:
+        counts (np.ndarray): Array of shape [n, 20]
+    Return:
+        np.ndarray: Entropy of each row, 0 for rows with no residues
+    '''
+    total = counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(counts > 0, counts * np.log(counts / total) / _LN2, 0.0)
+        ent = np.abs(terms.sum(axis=1) / total[:, 0])
+    return np.where(total[:, 0] > 0, ent, 0.0)
+
+def window_entropy(prefix, window=WINDOW):
+    '''Entropy of the window centred on each position, as computed by seg
+    Params:
+        prefix (np.ndarray): Output of prefix_counts
+        window (int): Trigger window length
+    Return:
+        np.ndarray: Entropy per position, -1 where the window doesn't fit
+    '''
+    length = len(prefix) - 1
+    H = np.full(length, -1.0)
+    if length < window:
+        return H
+
+    downset = (window + 1) // 2 - 1
+    H[downset:downset + length - window + 1] = entropy(prefix[window:] - prefix[:-window])
+    return H
+
+def log_probability(counts, length):
+    '''ln of the probability of each composition (seg's getprob)
+    Params:
+        counts (np.ndarray): Array of shape [n, 20], one composition per row
+        length (int or np.ndarray): Window length the compositions were taken from (per row)
+    Return:
+        np.ndarray: Log probability of each row
+    '''
+    alphasize = len(AMINO_ACIDS)
+
+    # Number of ways to assign counts to residues: 20! / product(multiplicity of each count value!)
+    ordered = np.sort(counts, axis=1)
+    run_start = np.ones(ordered.shape, dtype=bool)
+    run_start[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_end = np.ones(ordered.shape, dtype=bool)
+    run_end[:, :-1] = run_start[:, 1:]
+    columns = np.arange(alphasize)
+    run_length = columns - np.maximum.accumulate(np.where(run_start, columns, 0), axis=1) + 1
+    lnass = lnfac(alphasize) - np.where(run_end, lnfac(run_length), 0.0).sum(axis=1)
+    lnass = np.where(ordered[:, -1] == 0, lnfac(alphasize), lnass)
+
+    # Number of sequences with that composition
+    lnperm = lnfac(length) - lnfac(counts).sum(axis=1)
+
+    return lnass + lnperm - length * _LN20
+
+def trim(prefix, leftend, rightend, maxtrim=MAXTRIM):
+    '''Trim a segment to its least probable (lowest complexity) sub-segment
+    Params:
+        prefix (np.ndarray): Output of prefix_counts
+        leftend (int): First position of the segment
+        rightend (int): Last position of the segment
+        maxtrim (int): Maximum number of residues trimmed
+    Return:
+        (int, int): Trimmed leftend and rightend
+    '''
+    length = rightend - leftend + 1
+    minlen = max(1, length - maxtrim)
+
+    # Every window of every length, longest first, scored in as few NumPy calls as possible
+    minprob = 1.0
+    lend, rend = 0, length - 1
+    wins = np.arange(length, minlen, -1)
+    block = max(1, _TRIM_BLOCK_ROWS // length)
+    for index in range(0, len(wins), block):
+        # Window lengths and starts of this block, in seg's scan order
+        block_wins = wins[index:index + block]
+        num_starts = length - block_wins + 1
+        offsets = np.cumsum(num_starts) - num_starts
+        block_wins = np.repeat(block_wins, num_starts)
+        starts = np.arange(len(block_wins)) - np.repeat(offsets, num_starts)
+
+        probs = log_probability(prefix[leftend + starts + block_wins] - prefix[leftend + starts], block_wins)
+
+        # First minimum in (longest window, leftmost start) order, like seg's scan
+        best = int(np.argmin(probs))
+        if probs[best] < minprob:
+            minprob = probs[best]
+            lend, rend = int(starts[best]), int(starts[best] + block_wins[best] - 1)
+
+    return leftend + lend, rightend - (length - rend - 1)
+
+def segment(prefix, H, start, end, window=WINDOW, locut=LOCUT, hicut=HICUT, maxtrim=MAXTRIM):
+    '''Find the low-complexity segments of sequence[start:end + 1] (seg's segseq)
+    Params:
+        prefix (np.ndarray): Output of prefix_counts for the whole sequence
+        H (np.ndarray): Output of window_entropy for the whole sequence
+        start (int): First position to search
+        end (int): Last position to search
+        window (int): Trigger window length
+        locut (float): Trigger complexity
+        hicut (float): Extension complexity
+        maxtrim (int): Maximum number of residues trimmed
+    Return:
+        List[(int, int)]: First and last position of each segment
+    '''
+    segs = []
+    downset = (window + 1) // 2 - 1
+    upset = window - downset
+
+    first = start + downset
+    last = end + 1 - upset
+    lowlim = first
+
+    i = first
+    while i <= last:
+        if H[i] > locut:
+            i += 1
+            continue
+
+        # Extend while the windows stay below hicut
+        loi = i
+        while loi >= lowlim and H[loi] <= hicut:
+            loi -= 1
+        loi += 1
+
+        hii = i
+        while hii <= last and H[hii] <= hicut:
+            hii += 1
+        hii -= 1
+
+        leftend = loi - downset
+        rightend = hii + upset - 1
+        leftend, rightend = trim(prefix, leftend, rightend, maxtrim)
+
+        # Look for a shorter low-complexity segment in what was trimmed off the left
+        if i + upset - 1 < leftend:
+            segs += segment(prefix, H, loi - downset, leftend - 1, window, locut, hicut, maxtrim)
+
+        segs.append((leftend, rightend))
+
+        i = min(hii, rightend + downset) + 1
+        lowlim = i
+
+    return segs
+
+def merge_segments(segs):
+    '''Merge overlapping segments
+    Params:
+        segs (List[(int, int)]): First and last position of each segment
+    Return:
+        List[(int, int)]: Sorted, non-overlapping segments
+    '''
+    merged = []
+    for begin, end in sorted(segs):
+        if len(merged) > 0 and merged[-1][1] >= begin:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+
+    return merged
+
+def seg_sequence(sequence, window=WINDOW, locut=LOCUT, hicut=HICUT, maxtrim=MAXTRIM):
+    '''Low-complexity segments of a sequence
+    Params:
+        sequence (str): Amino acid sequence
+        window (int): Trigger window length
+        locut (float): Trigger complexity
+        hicut (float): Extension complexity
+        maxtrim (int): Maximum number of residues trimmed
+    Return:
+        List[(int, int)]: First and last position (0-based, inclusive) of each low-complexity segment
+    '''
+    prefix = prefix_counts(sequence)
+    H = window_entropy(prefix, window)
+    segs = segment(prefix, H, 0, len(sequence) - 1, window, locut, hicut, maxtrim)
+    return merge_segments(segs)
+
+def seg_lines(sequence, window=WINDOW, locut=LOCUT, hicut=HICUT, maxtrim=MAXTRIM):
+    '''Mask a sequence into the logical lines and ranges parse_file reads from seg's tree output
+    Params:
+        sequence (str): Amino acid sequence
+        window (int): Trigger window length
+        locut (float): Trigger complexity
+        hicut (float): Extension complexity
+        maxtrim (int): Maximum number of residues trimmed
+    Return:
+        (list[str], list[(int, int)]): list of lines (LCRs lower case, HCRs upper case), list of ranges (1-based, inclusive)
+    '''
+    sequence = sequence.upper()
+
+    # Alternate high-complexity gaps and low-complexity segments, like the tree output
+    pieces = []
+    position = 0
+    for begin, end in seg_sequence(sequence, window, locut, hicut, maxtrim):
+        if begin > position:
+            pieces.append((position, begin - 1, False))
+        pieces.append((begin, end, True))
+        position = end + 1
+    if position < len(sequence):
+        pieces.append((position, len(sequence) - 1, False))
+
+    logical_lines, ranges = [], []
+    last_lower = None
+    for begin, end, lower in pieces:
+        text = sequence[begin:end + 1]
+        text = text.lower() if lower else text
+
+        # Same case as the previous segment makes a single logical line
+        if lower == last_lower:
+            logical_lines[-1] += text
+        else:
+            logical_lines.append(text)
+        last_lower = lower
+
+        ranges.append((begin + 1, end + 1))
+
+    return logical_lines, ranges
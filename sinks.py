@@ -0,0 +1,361 @@
+import collections
+import csv
+import os
+import shutil
+import tempfile
+
+import composition
+
+'''
+OUTPUT SINKS
+'''
+class CsvSink:
+    '''Buffered writer for every csv file produced during a run.
+
+    Rows are kept in memory per destination file and written in bulk when the
+    buffer reaches max_rows or when the sink is flushed/closed. Header state is
+    tracked in memory, so each destination is only checked on disk once. Open
+    handles are kept between flushes (up to max_open, least recently used
+    handles are closed first) so hot files like overall.csv are opened once.
+
+    Files queued with last=True are written after every other file of the same
+    flush, so their existence can mark that the rest of a record's rows made it
+    to disk (main.py --resume relies on this for the per-id csvs).
+    '''
+    def __init__(self, max_rows=20000, max_open=256):
+        self.max_rows = max_rows
+        self.max_open = max_open
+
+        # Map from filepath to rows waiting to be written
+        self.buffers = {}
+        self.buffered = 0
+
+        # Filepaths whose header was already written or buffered
+        self.headers = set()
+
+        # Filepaths written at the end of each flush
+        self.last = set()
+
+        # Map from filepath to (file, csv writer), in least recently used order
+        self.handles = collections.OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def writerows(self, filepath, header, rows, last=False):
+        '''Queue rows for a csv file
+        Params:
+            filepath (str): File to write to
+            header (List[str]): Header written first if the file doesn't exist yet
+            rows (List[List]): Rows to append
+            last (bool): Write this file after the others on every flush
+        '''
+        if last:
+            self.last.add(filepath)
+
+        buffer = self.buffers.get(filepath)
+        if buffer == None:
+            buffer = self.buffers[filepath] = []
+
+        # Add header if file doesn't exist yet
+        if filepath not in self.headers:
+            self.headers.add(filepath)
+            if not os.path.isfile(filepath):
+                buffer.append(header)
+                self.buffered += 1
+
+        buffer.extend(rows)
+        self.buffered += len(rows)
+
+        if self.buffered >= self.max_rows:
+            self.flush()
+
+    def writerow(self, filepath, header, row, last=False):
+        self.writerows(filepath, header, [row], last)
+
+    def _writer(self, filepath):
+        '''Get the csv writer for a file, opening it if needed
+        '''
+        if filepath in self.handles:
+            self.handles.move_to_end(filepath)
+            return self.handles[filepath][1]
+
+        if len(self.handles) >= self.max_open:
+            _, (outfile, _) = self.handles.popitem(last=False)
+            outfile.close()
+
+        outfile = open(filepath, 'a', newline='')
+        writer = csv.writer(outfile, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self.handles[filepath] = (outfile, writer)
+        return writer
+
+    def flush(self):
+        '''Write all buffered rows, in the order the files were first used (files queued with last=True after the rest)
+        '''
+        for last in (False, True):
+            for filepath, rows in self.buffers.items():
+                if (filepath in self.last) == last:
+                    self._writer(filepath).writerows(rows)
+
+            for outfile, _ in self.handles.values():
+                outfile.flush()
+
+        self.buffers = {}
+        self.buffered = 0
+
+    def close(self):
+        '''Flush and close every open file
+        '''
+        self.flush()
+        for outfile, _ in self.handles.values():
+            outfile.close()
+        self.handles.clear()
+
+class ClusterStats:
+    '''Running statistics of one cluster
+    '''
+    def __init__(self, cluster):
+        '''
+        Params:
+            cluster (str): Cluster name, its letters are the most common letters of every culled string in it
+        '''
+        self.slots = composition.encode(cluster)
+        self.ids = []
+        # Proteins with a culled string in the cluster (their rows can come in any order, e.g. read back by --append)
+        self.proteins = set()
+        self.residues = 0
+        self.cluster_share = 0.0
+        self.composition = composition.CompositionAccumulator()
+
+    def add(self, fid, indexed_id, counts):
+        '''Add one culled string
+        Params:
+            fid (str): Protein Name
+            indexed_id (str): ID of the culled string
+            counts (np.ndarray): Counts per letter of the culled string, shape [26]
+        '''
+        self.ids.append(indexed_id)
+        self.proteins.add(fid)
+
+        length = int(counts.sum())
+        self.residues += length
+        if length > 0:
+            self.cluster_share += int(counts[self.slots].sum()) / length
+        self.composition.add(counts)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def mean_length(self):
+        return self.residues / len(self.ids)
+
+    def mean_cluster_percent(self):
+        '''Average share of the cluster letters in its culled strings
+        '''
+        return self.cluster_share / len(self.ids)
+
+class ClusterSink:
+    '''Rows of the cluster csvs, kept in memory per cluster and written once each when the sink closes.
+
+    ClusterStats of every cluster are updated as rows come in, so cluster-level
+    summaries don't need the csvs to be read back. When the buffered rows go
+    over max_bytes (roughly, by length of their text) they are spilled to
+    temporary files next to the cluster directory, which are copied into the
+    cluster csvs on close.
+    '''
+    def __init__(self, directory, header, max_bytes=1 << 28):
+        '''
+        Params:
+            directory (str): Cluster csv directory
+            header (List[str]): Header of the cluster csvs
+            max_bytes (int): Memory budget of the buffered rows
+        '''
+        self.directory = directory
+        self.header = header
+        self.max_bytes = max_bytes
+
+        # Map from cluster name to rows waiting to be written, and to ClusterStats (first seen order)
+        self.rows = {}
+        self.buffered_bytes = 0
+        self.stats = {}
+
+        # Map from cluster name to its spill file
+        self.spill_dir = None
+        self.spills = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def add(self, cluster, fid, row, counts):
+        '''Queue one row of a cluster csv
+        Params:
+            cluster (str): Cluster name
+            fid (str): Protein Name
+            row (List): Row of the cluster csv, starting with the ID of the culled string
+            counts (np.ndarray): Counts per letter of the culled string, shape [26]
+        '''
+        stats = self.stats.get(cluster)
+        if stats == None:
+            stats = self.stats[cluster] = ClusterStats(cluster)
+            self.rows[cluster] = []
+        stats.add(fid, row[0], counts)
+
+        self.rows[cluster].append(row)
+        self.buffered_bytes += sum(len(str(item)) + 1 for item in row)
+        if self.buffered_bytes > self.max_bytes:
+            self.spill()
+
+    def spill(self):
+        '''Move the buffered rows to the spill files
+        '''
+        if self.spill_dir == None:
+            self.spill_dir = tempfile.mkdtemp(prefix=".cluster-spill-", dir=os.path.dirname(os.path.abspath(self.directory)))
+
+        for cluster, rows in self.rows.items():
+            if len(rows) == 0:
+                continue
+            if cluster not in self.spills:
+                self.spills[cluster] = os.path.join(self.spill_dir, cluster + ".csv")
+            with open(self.spills[cluster], 'a', newline='') as f:
+                csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL).writerows(rows)
+            rows.clear()
+
+        self.buffered_bytes = 0
+
+    def close(self):
+        '''Write every cluster csv (appending, with a header only for new files) and remove the spill files
+        '''
+        for cluster, rows in self.rows.items():
+            filepath = os.path.join(self.directory, cluster + ".csv")
+            new_file = not os.path.isfile(filepath)
+            with open(filepath, 'a', newline='') as f:
+                writer = csv.writer(f, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+                if new_file:
+                    writer.writerow(self.header)
+                if cluster in self.spills:
+                    f.flush()
+                    with open(self.spills[cluster], 'r', newline='') as spill:
+                        shutil.copyfileobj(spill, f)
+                writer.writerows(rows)
+
+        if self.spill_dir != None:
+            shutil.rmtree(self.spill_dir)
+        self.rows = {}
+        self.spills = {}
+        self.spill_dir = None
+
+class TableSink:
+    '''Columnar output: every culled string of a run as one row of a Parquet or Feather (Arrow IPC) table.
+
+    Same fields as the sequences csvs plus the Protein Name, Cluster and Length,
+    with typed numeric columns, so later steps can memory-map and filter the
+    table instead of parsing text. Rows are written in record batches of
+    batch_rows. pyarrow is only needed (and imported) when a TableSink is used.
+    '''
+    FORMATS = ("parquet", "feather")
+
+    def __init__(self, filepath, batch_rows=65536):
+        '''
+        Params:
+            filepath (str): Table file, the format comes from the extension (.parquet or .feather)
+            batch_rows (int): Number of rows per record batch
+        '''
+        import pyarrow as pa
+
+        self.pa = pa
+        self.filepath = filepath
+        self.format = table_format(filepath)
+        self.batch_rows = batch_rows
+        self.writer = None
+
+        fields = [("ID", pa.string()), ("Protein", pa.string()), ("Sequence", pa.string()), ("Ranges", pa.string()),
+                  ("Criteria", pa.string()), ("Cluster", pa.string()), ("Length", pa.int32())]
+        for num in range(1, 5):
+            fields += [("Common {}".format(num), pa.string()), ("Count {}".format(num), pa.int32()), ("Percent {}".format(num), pa.float64())]
+        self.schema = pa.schema(fields)
+        self.columns = {name: [] for name in self.schema.names}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def add(self, row):
+        '''Queue one row
+        Params:
+            row (dict{str, }): Value of every column
+        '''
+        for name, column in self.columns.items():
+            column.append(row[name])
+
+        if len(self.columns["ID"]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        '''Write the queued rows as one record batch
+        '''
+        if self.writer == None:
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.filepath, self.schema)
+            else:
+                # Uncompressed, so readers can memory-map the columns
+                self.writer = self.pa.ipc.new_file(self.filepath, self.schema, options=self.pa.ipc.IpcWriteOptions(compression=None))
+
+        if len(self.columns["ID"]) == 0:
+            return
+
+        batch = self.pa.RecordBatch.from_pydict(self.columns, schema=self.schema)
+        if self.format == "parquet":
+            self.writer.write_batch(batch)
+        else:
+            self.writer.write(batch)
+        self.columns = {name: [] for name in self.schema.names}
+
+    def close(self):
+        '''Write the remaining rows and the file footer (an empty table if nothing was added)
+        '''
+        self.flush()
+        self.writer.close()
+
+def table_format(filepath):
+    '''Format of a table file from its extension
+    '''
+    fmt = os.path.splitext(filepath)[1].lstrip(".")
+    if fmt not in TableSink.FORMATS:
+        raise ValueError('"{}" is not a .parquet or .feather file'.format(filepath))
+    return fmt
+
+def read_table(filepath, columns=None, clusters=None):
+    '''Read a table written by TableSink, memory-mapped
+    Params:
+        filepath (str): .parquet or .feather file
+        columns (List[str]): Columns to read, None for all
+        clusters (List[str]): Only keep rows of these clusters, None for all
+    Return:
+        pyarrow.Table
+    '''
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if table_format(filepath) == "parquet":
+        import pyarrow.parquet as pq
+        filters = None if clusters == None else [("Cluster", "in", list(clusters))]
+        return pq.read_table(filepath, columns=columns, filters=filters, memory_map=True)
+
+    table = pa.ipc.open_file(pa.memory_map(filepath)).read_all()
+    if clusters != None:
+        table = table.filter(pc.is_in(table["Cluster"], value_set=pa.array(list(clusters), pa.string())))
+    if columns != None:
+        table = table.select(columns)
+    return table
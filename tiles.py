@@ -0,0 +1,197 @@
+import math
+import os
+
+import numpy as np
+
+import vector
+
+'''
+TILED OUTPUT
+
+Deep Zoom pyramids (a .dzi descriptor plus a <name>_files directory of tiles,
+read by viewers like OpenSeadragon) of images too large to hold as one bitmap.
+The drawing is recorded once with its bounding boxes, then every level of the
+pyramid is drawn tile by tile: the items are indexed by the tiles their
+bounding box covers (lines by the tiles along them), so each tile only draws
+what intersects it and only one tile bitmap is in memory at a time. Lower
+levels are drawn at their own scale instead of being downsampled from the
+level above.
+
+    recorder = DrawingRecorder()
+    network.render(recorder, "gcs")
+    write_pyramid("gcs-output.dzi", recorder, network.get_size(), load_font)
+'''
+# Side of the (square) tiles, in pixels
+TILE_SIZE = 256
+
+# Labels drawn smaller than this (in pixels) are left out of the tile
+MIN_FONT_SIZE = 2
+
+# Lines indexed at a time
+SEGMENT_CHUNK = 256
+
+class DrawingRecorder:
+    '''Records ellipse, line and text calls of the PIL ImageDraw API, in drawing order, with their bounding boxes
+    '''
+    def __init__(self):
+        # (kind, points, fill, width or font) of each call, and its bounding box (x0, y0, x1, y1)
+        self.items = []
+        self.boxes = []
+        # (item, x1, y1, x2, y2, width) of every segment of the lines
+        self.segments = []
+
+    def font(self, size):
+        return vector.VectorFont(size)
+
+    def ellipse(self, xy, fill=None):
+        points = vector.flatten_points(xy)
+        self.items.append(("ellipse", points, fill, None))
+        self.boxes.append((points[0], points[1], points[2], points[3]))
+
+    def line(self, xy, fill=None, width=1):
+        points = vector.flatten_points(xy)
+        xs, ys = points[0::2], points[1::2]
+        for index in range(len(xs) - 1):
+            self.segments.append((len(self.items), xs[index], ys[index], xs[index + 1], ys[index + 1], width))
+        self.items.append(("line", points, fill, width))
+        self.boxes.append((min(xs) - width, min(ys) - width, max(xs) + width, max(ys) + width))
+
+    def text(self, xy, text, fill=None, font=None):
+        # Wider and taller than any label of that size, the tiles clip the rest
+        size = font.size
+        self.items.append(("text", (xy[0], xy[1], text), fill, size))
+        self.boxes.append((xy[0], xy[1], xy[0] + size * len(text), xy[1] + 1.5 * size))
+
+def box_tiles(boxes, items, tile_size, cols, rows):
+    '''(tile, item) pairs of every tile the bounding box of each item covers
+    '''
+    col0 = np.clip(np.floor(boxes[:, 0] / tile_size), 0, cols - 1).astype(np.int64)
+    row0 = np.clip(np.floor(boxes[:, 1] / tile_size), 0, rows - 1).astype(np.int64)
+    col1 = np.clip(np.floor(boxes[:, 2] / tile_size), 0, cols - 1).astype(np.int64)
+    row1 = np.clip(np.floor(boxes[:, 3] / tile_size), 0, rows - 1).astype(np.int64)
+    # Items entirely outside the level have nothing to draw
+    inside = (boxes[:, 2] >= 0) & (boxes[:, 3] >= 0) & (boxes[:, 0] < cols * tile_size) & (boxes[:, 1] < rows * tile_size)
+    spans_x = np.where(inside, col1 - col0 + 1, 0)
+    spans_y = np.where(inside, row1 - row0 + 1, 0)
+
+    counts = spans_x * spans_y
+    entries = np.repeat(np.arange(len(boxes)), counts)
+    offsets = np.arange(len(entries)) - np.repeat(np.cumsum(counts) - counts, counts)
+    tile_cols = col0[entries] + offsets % spans_x[entries]
+    tile_rows = row0[entries] + offsets // spans_x[entries]
+    return tile_rows * cols + tile_cols, items[entries]
+
+def segment_tiles(segments, tile_size, cols, rows):
+    '''(tile, item) pairs of the tiles along each segment (item, x1, y1, x2, y2, width), possibly repeated
+
+    Points are taken every quarter of a tile along the segment, each covering a
+    box of half that step plus the width of the line around it, so every pixel of
+    the line is in one of the boxes. Long lines then only cover the tiles they
+    cross instead of every tile of their bounding box.
+    '''
+    step = tile_size / 4
+    x1, y1, x2, y2, width = segments[:, 1], segments[:, 2], segments[:, 3], segments[:, 4], segments[:, 5]
+    samples = np.ceil(np.hypot(x2 - x1, y2 - y1) / step).astype(np.int64) + 1
+    entries = np.repeat(np.arange(len(segments)), samples)
+    offsets = np.arange(len(entries)) - np.repeat(np.cumsum(samples) - samples, samples)
+    t = offsets / np.maximum(samples[entries] - 1, 1)
+    xs = x1[entries] + t * (x2 - x1)[entries]
+    ys = y1[entries] + t * (y2 - y1)[entries]
+    margin = step / 2 + width[entries]
+
+    boxes = np.stack([xs - margin, ys - margin, xs + margin, ys + margin], axis=1)
+    return box_tiles(boxes, segments[entries, 0].astype(np.int64), tile_size, cols, rows)
+
+def tile_index(boxes, tile_size, cols, rows, segments=None):
+    '''Items drawn on each tile of a level, in drawing order
+    Params:
+        boxes (np.ndarray): Bounding box of each item at the scale of the level, shape [items, 4]
+        tile_size (int): Side of the tiles
+        cols, rows (int): Number of tiles of the level
+        segments (np.ndarray): Items drawn as lines, indexed by the tiles along them instead of their
+            bounding box: item, x1, y1, x2, y2, width at the scale of the level, shape [segments, 6]
+    Return:
+        Tuple[np.ndarray, np.ndarray]: Items of every tile one after the other, and where the items of
+            tile (col, row) start: items[starts[row * cols + col]:starts[row * cols + col + 1]]
+    '''
+    boxed = np.ones(len(boxes), dtype=bool)
+    if segments is not None:
+        boxed[segments[:, 0].astype(np.int64)] = False
+    tile_ids, items = box_tiles(boxes[boxed], np.flatnonzero(boxed), tile_size, cols, rows)
+    keys = [tile_ids * len(boxes) + items]
+    if segments is not None:
+        # A few segments at a time, the points along all of them would take more memory than the tiles
+        for start in range(0, len(segments), SEGMENT_CHUNK):
+            tile_ids, items = segment_tiles(segments[start:start + SEGMENT_CHUNK], tile_size, cols, rows)
+            keys.append(np.unique(tile_ids * len(boxes) + items))
+
+    # Sorted by tile then item (drawing order), each pair once
+    keys = np.unique(np.concatenate(keys))
+    starts = np.searchsorted(keys, np.arange(cols * rows + 1) * len(boxes))
+    return keys % max(len(boxes), 1), starts
+
+def draw_tile(draw_ctx, recorder, items, scale, origin, load_font):
+    '''Draw recorded items on a tile whose top left corner is at origin in the level (scaled by scale)
+    '''
+    x0, y0 = origin
+    for index in items.tolist():
+        kind, points, fill, extra = recorder.items[index]
+        if kind == "text":
+            x, y, text = points
+            size = int(round(extra * scale))
+            if size >= MIN_FONT_SIZE:
+                draw_ctx.text((x * scale - x0, y * scale - y0), text, font=load_font(size), fill=fill)
+            continue
+
+        # PIL truncates ellipse and line coordinates, truncating before moving to the tile keeps
+        # the pixels of the whole image (no seams, and the pixels of draw() at full scale, but for
+        # the edges of some wide lines, which PIL rounds differently depending on where they are)
+        shifted = [(math.trunc(points[i] * scale) - x0, math.trunc(points[i + 1] * scale) - y0) for i in range(0, len(points), 2)]
+        if kind == "ellipse":
+            draw_ctx.ellipse(shifted, fill=fill)
+        else:
+            draw_ctx.line(shifted, fill=fill, width=max(1, int(round(extra * scale))))
+
+def write_pyramid(filepath, recorder, size, load_font, tile_size=TILE_SIZE, background="white"):
+    '''Write the recorded drawing as a Deep Zoom pyramid of PNG tiles
+    Params:
+        filepath (str): Descriptor file (.dzi), the tiles go in the "<name>_files" directory next to it
+        recorder (DrawingRecorder): Drawing of the full resolution image
+        size (Tuple[int, int]): Width and height of the full resolution image
+        load_font (function): PIL font of a given size, called for every label drawn (so it should cache them)
+        tile_size (int): Side of the tiles
+        background: Color of the image
+    '''
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    with open(filepath, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="png" Overlap="0" TileSize="{}">\n'.format(tile_size))
+        f.write('  <Size Width="{}" Height="{}"/>\n</Image>\n'.format(width, height))
+
+    tile_dir = os.path.splitext(filepath)[0] + "_files"
+    boxes = np.array(recorder.boxes, dtype=float).reshape(-1, 4)
+    segments = np.array(recorder.segments, dtype=float).reshape(-1, 6)
+    # Level max_level is the full image, each level below is half the size, down to 1x1
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    for level in range(max_level, -1, -1):
+        scale = 0.5 ** (max_level - level)
+        level_width, level_height = max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+        cols, rows = math.ceil(level_width / tile_size), math.ceil(level_height / tile_size)
+        # Lines at least 1 pixel wide, like draw_tile draws them
+        level_segments = segments * np.array([1, scale, scale, scale, scale, 0])
+        level_segments[:, 5] = np.maximum(segments[:, 5] * scale, 1)
+        items, starts = tile_index(boxes * scale, tile_size, cols, rows, level_segments)
+
+        level_dir = os.path.join(tile_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        for row in range(rows):
+            for col in range(cols):
+                origin = (col * tile_size, row * tile_size)
+                tile_width = min(tile_size, level_width - origin[0])
+                tile_height = min(tile_size, level_height - origin[1])
+                image = Image.new("RGB", (tile_width, tile_height), background)
+                tile = row * cols + col
+                draw_tile(ImageDraw.Draw(image, "RGBA"), recorder, items[starts[tile]:starts[tile + 1]], scale, origin, load_font)
+                image.save(os.path.join(level_dir, "{}_{}.png".format(col, row)), "PNG")
@@ -0,0 +1,252 @@
+import collections
+import os
+from xml.sax.saxutils import escape
+
+'''
+VECTOR OUTPUT
+
+SVG and PDF canvases with the part of the PIL ImageDraw API visual.py draws
+with (ellipse, line and text), so a network can be drawn from the same layout
+without allocating a bitmap. Every element is written to the file as soon as it
+is drawn; only the PDF resources (fonts, opacities) are kept until close.
+
+    with open_canvas("gcs-output.svg", network.get_size()) as draw_ctx:
+        draw_ctx.ellipse([(0, 0), (10, 10)], fill=(40, 82, 122, 80))
+'''
+VECTOR_FORMATS = ("svg", "pdf")
+
+# Font of vector labels: only its size matters, the text is drawn by the viewer
+VectorFont = collections.namedtuple("VectorFont", ["size"])
+
+# Distance from the top of a label (where PIL places it) to its baseline, in font sizes
+ASCENT = 0.93
+
+# Color names accepted besides (r, g, b) and (r, g, b, a) tuples
+COLOR_NAMES = {"black": (0, 0, 0), "white": (255, 255, 255)}
+
+def vector_format(filepath):
+    '''Vector format of an output file from its extension, None for raster images
+    '''
+    fmt = os.path.splitext(filepath)[1].lstrip(".").lower()
+    return fmt if fmt in VECTOR_FORMATS else None
+
+def open_canvas(filepath, size, background="white"):
+    '''SvgCanvas or PdfCanvas for a file, from its extension
+    Params:
+        filepath (str): Output file (.svg or .pdf)
+        size (Tuple[int, int]): Width and height, in pixels
+        background: Color of the whole canvas, None for transparent
+    '''
+    fmt = vector_format(filepath)
+    if fmt == None:
+        raise ValueError('"{}" is not a .svg or .pdf file'.format(filepath))
+    canvas = SvgCanvas if fmt == "svg" else PdfCanvas
+    return canvas(filepath, size, background)
+
+def parse_color(fill):
+    '''(r, g, b, a) of a PIL color: a tuple or one of COLOR_NAMES
+    '''
+    if isinstance(fill, str):
+        if fill.lower() not in COLOR_NAMES:
+            raise ValueError('Unknown color "{}"'.format(fill))
+        return COLOR_NAMES[fill.lower()] + (255,)
+    if len(fill) == 3:
+        return tuple(fill) + (255,)
+    return tuple(fill)
+
+def format_number(value):
+    # Coordinates to the hundredth of a pixel, without trailing zeros
+    return "{:.2f}".format(value).rstrip("0").rstrip(".")
+
+def flatten_points(xy):
+    # [(x1, y1), (x2, y2)] or [x1, y1, x2, y2] to [x1, y1, x2, y2]
+    points = []
+    for item in xy:
+        if isinstance(item, (tuple, list)):
+            points.extend(item)
+        else:
+            points.append(item)
+    return points
+
+class VectorCanvas:
+    '''Common part of the vector canvases: file handling and argument parsing of the ImageDraw-like methods
+    '''
+    def __init__(self, filepath, size, mode):
+        self.filepath = filepath
+        self.width, self.height = size
+        self.f = open(filepath, mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def font(self, size):
+        return VectorFont(size)
+
+    def ellipse(self, xy, fill=None):
+        '''Ellipse in the bounding box xy ([(x0, y0), (x1, y1)] or [x0, y0, x1, y1])
+        '''
+        if fill == None:
+            return
+        x0, y0, x1, y1 = flatten_points(xy)
+        self.write_ellipse((x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2, parse_color(fill))
+
+    def line(self, xy, fill=None, width=1):
+        '''Line through the points of xy ([(x, y), ...] or [x, y, ...])
+        '''
+        if fill == None:
+            return
+        points = flatten_points(xy)
+        for index in range(0, len(points) - 2, 2):
+            self.write_line(points[index:index + 4], parse_color(fill), width)
+
+    def text(self, xy, text, fill="black", font=None):
+        '''Label whose top left corner is xy, font being a VectorFont or a PIL font (only its size is used)
+        '''
+        size = font.size if font != None else 10
+        self.write_text(xy[0], xy[1] + ASCENT * size, text, parse_color(fill), size)
+
+    def close(self):
+        self.f.close()
+
+class SvgCanvas(VectorCanvas):
+    '''Canvas streamed to an SVG file, one element per line
+    '''
+    def __init__(self, filepath, size, background="white"):
+        super().__init__(filepath, size, "w")
+        width, height = format_number(self.width), format_number(self.height)
+        self.f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.f.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">\n'.format(width, height))
+        if background != None:
+            self.f.write('<rect width="100%" height="100%" {}/>\n'.format(self.paint("fill", parse_color(background))))
+
+    def paint(self, attribute, color):
+        # fill or stroke attributes of a color, opacity left out when opaque
+        r, g, b, a = color
+        paint = '{}="rgb({},{},{})"'.format(attribute, r, g, b)
+        if a != 255:
+            paint += ' {}-opacity="{}"'.format(attribute, format_number(a / 255))
+        return paint
+
+    def write_ellipse(self, cx, cy, rx, ry, color):
+        cx, cy, rx, ry = map(format_number, (cx, cy, rx, ry))
+        if rx == ry:
+            self.f.write('<circle cx="{}" cy="{}" r="{}" {}/>\n'.format(cx, cy, rx, self.paint("fill", color)))
+        else:
+            self.f.write('<ellipse cx="{}" cy="{}" rx="{}" ry="{}" {}/>\n'.format(cx, cy, rx, ry, self.paint("fill", color)))
+
+    def write_line(self, points, color, width):
+        x1, y1, x2, y2 = map(format_number, points)
+        self.f.write('<line x1="{}" y1="{}" x2="{}" y2="{}" stroke-width="{}" {}/>\n'.format(
+            x1, y1, x2, y2, format_number(width), self.paint("stroke", color)))
+
+    def write_text(self, x, baseline, text, color, size):
+        self.f.write('<text x="{}" y="{}" font-family="Roboto, sans-serif" font-weight="300" font-size="{}" {}>{}</text>\n'.format(
+            format_number(x), format_number(baseline), format_number(size), self.paint("fill", color), escape(text)))
+
+    def close(self):
+        self.f.write('</svg>\n')
+        super().close()
+
+class PdfCanvas(VectorCanvas):
+    '''Canvas streamed to a single page PDF.
+
+    The page content is written as one uncompressed stream while drawing (with
+    the y axis flipped, so coordinates are the same as the PIL ones). Objects
+    whose content is only known at the end (the stream length and the
+    resources) are written after it, then the cross-reference table. Pages
+    larger than 14400 units (the limit of most viewers) are scaled down.
+    '''
+    # Control points of a quarter circle as a cubic Bezier curve
+    KAPPA = 0.5522847498
+
+    # Largest page side
+    MAX_SIDE = 14400
+
+    def __init__(self, filepath, size, background="white"):
+        super().__init__(filepath, size, "wb")
+        self.scale = min(1.0, self.MAX_SIDE / max(self.width, self.height, 1))
+
+        # Byte offset of each object, opacities used (by ExtGState name) and current graphics state
+        self.offsets = {}
+        self.opacities = set()
+        self.state = {}
+
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.offsets[4] = self.f.tell()
+        self.f.write(b"4 0 obj\n<< /Length 5 0 R >>\nstream\n")
+        self.stream_start = self.f.tell()
+        self.write("{0:.6f} 0 0 {1:.6f} 0 {2} cm".format(self.scale, -self.scale, format_number(self.height * self.scale)))
+        if background != None:
+            self.set_paint("rg", parse_color(background))
+            self.write("0 0 {} {} re f".format(format_number(self.width), format_number(self.height)))
+
+    def write(self, content):
+        self.f.write(content.encode("latin-1") + b"\n")
+
+    def set_paint(self, operator, color):
+        # Opacity (one ExtGState per alpha) and fill (rg) or stroke (RG) color, only written when they change
+        r, g, b, a = color
+        if self.state.get("gs") != a:
+            self.opacities.add(a)
+            self.write("/GS{} gs".format(a))
+            self.state["gs"] = a
+        if self.state.get(operator) != (r, g, b):
+            self.write("{} {} {} {}".format(format_number(r / 255), format_number(g / 255), format_number(b / 255), operator))
+            self.state[operator] = (r, g, b)
+
+    def write_ellipse(self, cx, cy, rx, ry, color):
+        self.set_paint("rg", color)
+        kx, ky = self.KAPPA * rx, self.KAPPA * ry
+        points = [
+            (cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry),
+            (cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy),
+            (cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry),
+            (cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy),
+        ]
+        path = ["{} {} m".format(format_number(cx + rx), format_number(cy))]
+        path += [" ".join(map(format_number, curve)) + " c" for curve in points]
+        self.write(" ".join(path) + " f")
+
+    def write_line(self, points, color, width):
+        self.set_paint("RG", color)
+        if self.state.get("w") != width:
+            self.write("{} w".format(format_number(width)))
+            self.state["w"] = width
+        x1, y1, x2, y2 = map(format_number, points)
+        self.write("{} {} m {} {} l S".format(x1, y1, x2, y2))
+
+    def write_text(self, x, baseline, text, color, size):
+        self.set_paint("rg", color)
+        # Helvetica only has latin-1 letters, and parentheses delimit the string
+        text = text.encode("latin-1", "replace").decode("latin-1")
+        text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        # The text matrix flips the y axis back, so letters aren't upside down
+        self.write("BT /F1 {} Tf 1 0 0 -1 {} {} Tm ({}) Tj ET".format(
+            format_number(size), format_number(x), format_number(baseline), text))
+
+    def write_object(self, number, content):
+        self.offsets[number] = self.f.tell()
+        self.f.write("{} 0 obj\n{}\nendobj\n".format(number, content).encode("latin-1"))
+
+    def close(self):
+        length = self.f.tell() - self.stream_start
+        self.f.write(b"endstream\nendobj\n")
+
+        width, height = format_number(self.width * self.scale), format_number(self.height * self.scale)
+        opacities = " ".join("/GS{0} << /ca {1} /CA {1} >>".format(a, format_number(a / 255)) for a in sorted(self.opacities))
+        self.write_object(5, str(length))
+        self.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        self.write_object(2, "<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+        self.write_object(3, "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] /Contents 4 0 R /Resources 6 0 R >>".format(width, height))
+        self.write_object(6, "<< /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica >> >> /ExtGState << {} >> >>".format(opacities))
+
+        xref = self.f.tell()
+        entries = ["xref", "0 7", "0000000000 65535 f "]
+        entries += ["{:010d} 00000 n ".format(self.offsets[number]) for number in range(1, 7)]
+        entries += ["trailer", "<< /Size 7 /Root 1 0 R >>", "startxref", str(xref), "%%EOF"]
+        self.f.write(("\n".join(entries) + "\n").encode("latin-1"))
+        super().close()
@@ -1,128 +1,139 @@
 import math
-import random
 import os
 import argparse
-from PIL import Image, ImageDraw, ImageFont
-import assets.circlify as circ
-import pandas as pd
 import csv
 
-# GLOBAL TO TRACK FILES
-fid_to_location = {}
+# numpy, PIL, pandas and the layout, tiles, vector and assets.circlify modules are
+# imported where they are used, so importing this module (or running --help) doesn't
+# pay for them
+
+"""
+# STYLE
+"""
+# The font is found next to this file, whatever the working directory
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+FONT_PATH = os.path.join(ASSETS_DIR, "Roboto-Light.ttf")
+
+# Fill colors (r, g, b, a) of the circles, and color of the labels and lines (their alpha
+# comes from the number of edges they stand for)
+SINGLE_NODE_COLOR = (40, 82, 122, 80)
+CLUSTER_COLOR = (138, 196, 208, 123)
+GROUP_COLOR = (244, 209, 96, 125)
+LABEL_COLOR = "BLACK"
+EDGE_COLOR = (0, 0, 0)
+BACKGROUND_COLOR = "white"
+
+# Label font sizes and width of the lines, in pixels
+CLUSTER_LABEL_SIZE = 25
+GROUP_LABEL_SIZE = 30
+EDGE_WIDTH = 3
+
+# TrueType fonts of the current process by size, each read and parsed on first use
+# (worker processes load their own, once)
+_fonts = {}
+
+def truetype_font(size):
+    '''Label font of a size for PIL, shared by every image drawn in this process
+    '''
+    if size not in _fonts:
+        from PIL import ImageFont
+        _fonts[size] = ImageFont.truetype(FONT_PATH, size)
+    return _fonts[size]
+
+def label_font(draw_ctx, size):
+    # Vector canvases and tile recorders only need the size of a label, PIL needs the TrueType font
+    import tiles
+    import vector
+
+    if isinstance(draw_ctx, (vector.VectorCanvas, tiles.DrawingRecorder)):
+        return draw_ctx.font(size)
+    return truetype_font(size)
 
 """
 # UTIL FUNCTIONS
 """
+# Which nodes of a protein are connected: every pair, each to the first node, a minimum spanning tree, or none
+EDGE_MODES = ("all", "star", "mst", "none")
+
+# Random placement in each container (layout.py), or nested circles packed by assets.circlify
+LAYOUT_MODES = ("random", "packed")
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Analysis program.")
-    parser.add_argument("input", help="Directory containing all input files")
-    parser.add_argument("--out", help="Output image name", default="output.png")
+    parser.add_argument("input", help="Output directory of main.py, or the lcrs.parquet/lcrs.feather table written by main.py --table")
+    parser.add_argument("--out", help="Output image name, .svg or .pdf for vector images streamed to the file, .dzi for a Deep Zoom pyramid of tiles", default="output.png")
+    parser.add_argument("--edges", help="Lines between the LCRs of a protein: every pair, each to the first LCR, a minimum spanning tree, or none", choices=EDGE_MODES, default="all")
+    parser.add_argument("--max-edges", help="Proteins that would get more lines than this get a minimum spanning tree instead (with --edges all)", type=int, default=None)
+    parser.add_argument("--seed", help="Seed of the network layout, the same seed gives the same images", type=int, default=0)
+    parser.add_argument("--layout", help="Place circles at random in their container, or pack them without overlaps, areas proportional to their number of LCRs", choices=LAYOUT_MODES, default="random")
     args = parser.parse_args()
 
     return args
 
+def read_cluster_csvs(cluster_input_dir):
+    # Map from cluster name to (ID, culled string) of every row in the cluster csvs
+    cluster_rows = {}
+    for cluster_file in os.listdir(cluster_input_dir):
+        try:
+            with open(os.path.join(cluster_input_dir, cluster_file), 'r') as f:
+                cluster_lines = f.readlines()
+        except:
+            #print("Invalid file format found: {}".format(cluster_input_dir))
+            continue
+        rows = cluster_rows[cluster_file.split(".")[0]] = []
+        for cluster_line in cluster_lines[1:]:
+            spl = cluster_line.split(",")
+            rows.append((spl[0], spl[1]))
+    return cluster_rows
+
+def read_cluster_table(table_path):
+    # Same as read_cluster_csvs, from the memory-mapped table (no text parsing)
+    from sinks import read_table
+
+    table = read_table(table_path, columns=["ID", "Cluster", "Sequence"])
+    cluster_rows = {}
+    for indexed_id, cluster_name, culled_str in zip(*(table[name].to_pylist() for name in ["ID", "Cluster", "Sequence"])):
+        cluster_rows.setdefault(cluster_name, []).append((indexed_id, culled_str))
+    return cluster_rows
+
 """
 # GROUP FUNCTIONS
 """
-def get_group_name(pair):
-    if cation_pi_check(pair):
+# Residue groups, a residue belongs to the first group listing it
+RESIDUE_GROUPS = [
+    ("Hydro", "AILMV"),
+    ("Aromatic", "FYW"),
+    ("Polar", "QNSTC"),
+    ("Charge", "RKEDH"),
+    ("Unique", "GP"),
+]
+
+# Any of these residues makes the whole cluster Cation-Pi
+CATION_PI = "KRYF"
+
+def build_group_table():
+    # Lookup table indexed by residue byte: its group name, None for residues without one
+    table = [None] * 256
+    for group_name, letters in reversed(RESIDUE_GROUPS):
+        for letter in letters.encode():
+            table[letter] = group_name
+    return table
+
+GROUP_TABLE = build_group_table()
+CATION_PI_TABLE = [letter in CATION_PI.encode() for letter in range(256)]
+
+def get_group_name(cluster):
+    # Works for cluster names of any size (main.py --cluster-size), one table lookup per residue
+    residues = cluster.encode()
+    if any(CATION_PI_TABLE[residue] for residue in residues):
         return "Cation-Pi"
 
-    groups = []
-
-    for letter in pair:
-        if hydro_check(letter):
-            groups.append("Hydro")
-        elif aromatic_check(letter):
-            groups.append("Aromatic")
-        elif polar_check(letter):
-            groups.append("Polar")
-        elif charge_check(letter):
-            groups.append("Charge")
-        elif unique_check(letter):
-            groups.append("Unique")
-
-    return "-".join(groups)
-
-def cation_pi_check(pair):
-    # Special check
-    letters = "KRYF"
-    for pair_letter in pair:
-        if pair_letter in letters:
-            return True
-    return False
-
-def hydro_check(letter):
-    letters = "AILMV"
-    return letter in letters
-
-def aromatic_check(letter):
-    letters = "FYW"
-    return letter in letters
-
-def polar_check(letter):
-    letters = "QNSTC"
-    return letter in letters
-
-def charge_check(letter):
-    letters = "RKEDH"
-    return letter in letters
-
-def unique_check(letter):
-    letters = "GP"
-    return letter in letters
-
-"""
-# UTIL FUNCTIONS
-"""
+    groups = [GROUP_TABLE[residue] for residue in residues]
+    return "-".join(group for group in groups if group != None)
 
-def circle_pos(pos, radius, angle):
-    x = pos[0] + radius * math.cos(angle)
-    y = pos[1] + radius * math.sin(angle)
-    return (x, y)
-
-def rand_angle():
-    return random.random() * (2 * math.pi)
-
-class Circle:
-    def __init__(self, position, radius):
-        self.position = position
-        self.radius = radius
-
-    def single_circle_overlapping(self, circle):
-        dist = math.dist(self.position, circle.position)
-        return dist < self.radius + circle.radius
-
-    def circles_not_overlapping(self, circles):
-        for circle in circles:
-            if self.single_circle_overlapping(circle):
-                return False
-        return True
-
-    def circles_not_in_canvas(self, border):
-        if self.position[0] - self.radius < border[0]:
-            return True
-        if self.position[0] + self.radius > border[1]:
-            return True
-        if self.position[1] - self.radius < border[2]:
-            return True
-        if self.position[1] + self.radius > border[3]:
-            return True
-        return False
-
-def repeat_draw_until_success(randomize_fn, draw_fn, circles_drawn, border_check_args=None):
-    for iteration in range(100):
-        circle = randomize_fn()
-        if circle.circles_not_overlapping(circles_drawn):
-            if border_check_args != None:
-                if not circle.circles_not_in_canvas(border_check_args):
-                    break
-            else:
-                break
-
-
-    draw_fn(circle)
-    return circles_drawn + [circle] 
+def cluster_residues(cluster):
+    # Residues of a cluster in both cases, as bytes to delete with bytes.translate
+    return (cluster.upper() + cluster.lower()).encode()
 
 """
 # DATA STRUCT
@@ -133,13 +144,13 @@ class SingleNode:
         self.index = indexed_id.split(".")[1]
         self.percentage = None
         self.normalized_percentage = None
+        self.center = None
+        self.radius = None
 
-    def calc_percentage(self, pair, culled_str):
-        # Make sure they're both lower case
-        culled_str = culled_str.lower()
-        pair = pair.lower()
-
-        occurences = culled_str.count(pair[0]) + culled_str.count(pair[1])
+    def calc_percentage(self, residues, culled_str):
+        # residues from cluster_residues, deleting them leaves the string shorter by their number of occurences
+        culled_bytes = culled_str.encode()
+        occurences = len(culled_bytes) - len(culled_bytes.translate(None, residues))
         self.percentage = round((occurences / len(culled_str)) * 100)
 
     def get_radius(self):
@@ -152,20 +163,18 @@ class SingleNode:
         else:
             self.normalized_percentage = 0
 
-    def draw(self, draw_ctx, center, network_type):
-        # Log position to draw lines
-        if self.fid not in fid_to_location:
-            fid_to_location[self.fid] = []
-        fid_to_location[self.fid].append(center)
-
-        single_node_radius = self.get_radius()
-        position_a = (center[0] - single_node_radius, center[1] - single_node_radius)
-        position_b = (center[0] + single_node_radius, center[1] + single_node_radius)
-        draw_ctx.ellipse([position_a, position_b], fill=(40, 82, 122, 80))
+    def draw(self, draw_ctx, network_type):
+        single_node_radius = self.radius
+        position_a = (self.center[0] - single_node_radius, self.center[1] - single_node_radius)
+        position_b = (self.center[0] + single_node_radius, self.center[1] + single_node_radius)
+        draw_ctx.ellipse([position_a, position_b], fill=SINGLE_NODE_COLOR)
 
 class ClusterNode:
     def __init__(self, pair):
         self.pair = pair
+        self.residues = cluster_residues(pair)
+        self.center = None
+        self.radius = None
 
         # Map from indexed_id ("15.1") to the Single Nodes
         self.single_nodes = {}
@@ -174,51 +183,53 @@ class ClusterNode:
         assert(indexed_id not in self.single_nodes)
 
         self.single_nodes[indexed_id] = SingleNode(indexed_id)
-        self.single_nodes[indexed_id].calc_percentage(self.pair, culled_str)
+        self.single_nodes[indexed_id].calc_percentage(self.residues, culled_str)
 
     def get_radius(self):
         # NOTE: Log used so that radius doesn't grow too large
         return 30 * math.log(1 + len(self.single_nodes))
 
-    def draw(self, draw_ctx, center, network_type):
-        # Sort single_nodes by percentage
-        sorted_items = sorted(self.single_nodes.items(), key=lambda x: x[1].percentage)
+    def layout(self, rng, center):
+        # Single nodes sit further from the center the more of the cluster letters they hold, lowest percentage placed first
+        import layout
+
+        self.center = center
+        self.radius = self.get_radius()
+        sorted_items = sorted(self.single_nodes.items(), key=lambda x: (x[1].percentage, x[0]))
         for node in self.single_nodes.values():
             node.normalize_percentage(sorted_items[0][1].percentage, sorted_items[-1][1].percentage)
-        
+
+        cluster_radius = self.radius
+        radii = [single_node.get_radius() for _, single_node in sorted_items]
+        distances = [(cluster_radius - radius) * single_node.normalized_percentage for radius, (_, single_node) in zip(radii, sorted_items)]
+        centers, overlapping = layout.pack_in_circle(rng, center, cluster_radius, radii, distances)
+        for (_, single_node), single_center, radius in zip(sorted_items, centers, radii):
+            single_node.center = single_center
+            single_node.radius = radius
+        return overlapping
+
+    def draw(self, draw_ctx, network_type):
         # Draw cluster circle
-        cluster_radius = self.get_radius()
-        position_a = (center[0] - cluster_radius, center[1] - cluster_radius)
-        position_b = (center[0] + cluster_radius, center[1] + cluster_radius)
+        cluster_radius = self.radius
+        position_a = (self.center[0] - cluster_radius, self.center[1] - cluster_radius)
+        position_b = (self.center[0] + cluster_radius, self.center[1] + cluster_radius)
         if network_type == "gcs":
-            font = ImageFont.truetype("assets/Roboto-Light.ttf", 25)
-            text_pos = (center[0] - 20, center[1] + cluster_radius)
-            draw_ctx.text(text_pos, self.pair, font=font, fill="BLACK")
-            draw_ctx.ellipse([position_a, position_b], fill=(138, 196, 208, 123))
+            font = label_font(draw_ctx, CLUSTER_LABEL_SIZE)
+            text_pos = (self.center[0] - 20, self.center[1] + cluster_radius)
+            draw_ctx.text(text_pos, self.pair, font=font, fill=LABEL_COLOR)
+            draw_ctx.ellipse([position_a, position_b], fill=CLUSTER_COLOR)
         elif network_type == "gs":
             pass
 
-
-
         # Draw nodes within cluster
-        circles_drawn = []
-        for indexed_id, single_node in sorted_items:
-            def randomize_fn():
-                single_node_radius = single_node.get_radius()
-                radius = (cluster_radius - single_node_radius) * single_node.normalized_percentage 
-                angle = rand_angle()
-                cur_position = circle_pos(center, radius, angle)
-
-                return Circle(cur_position, single_node_radius)
-
-            def draw_fn(circle):
-                single_node.draw(draw_ctx, circle.position, network_type)
-
-            circles_drawn = repeat_draw_until_success(randomize_fn, draw_fn, circles_drawn)
+        for single_node in self.single_nodes.values():
+            single_node.draw(draw_ctx, network_type)
 
 class GroupNode:
     def __init__(self, group_name):
         self.group_name = group_name
+        self.center = None
+        self.radius = None
 
         # Map from cluster name ("AB") to Cluster Nodes
         self.cluster_nodes = {}
@@ -232,39 +243,46 @@ class GroupNode:
     def get_radius(self):
         return sum(list(map(lambda x: x.get_radius() * 1.3, self.cluster_nodes.values())))
 
-    def draw(self, draw_ctx, center, network_type):
+    def layout(self, rng, center):
+        import layout
+
+        self.center = center
+        self.radius = self.get_radius()
+        keys = sorted(self.cluster_nodes)
+        radii = [self.cluster_nodes[key].get_radius() for key in keys]
+        centers, overlapping = layout.pack_in_circle(rng, center, self.radius, radii)
+        for key, cluster_center in zip(keys, centers):
+            overlapping += self.cluster_nodes[key].layout(rng, cluster_center)
+        return overlapping
+
+    def draw(self, draw_ctx, network_type):
         # Draw group circle
-        group_radius = self.get_radius()
-        position_a = (center[0] - group_radius, center[1] - group_radius)
-        position_b = (center[0] + group_radius, center[1] + group_radius)
-        draw_ctx.ellipse([position_a, position_b], fill=(244, 209, 96, 125))
+        group_radius = self.radius
+        position_a = (self.center[0] - group_radius, self.center[1] - group_radius)
+        position_b = (self.center[0] + group_radius, self.center[1] + group_radius)
+        draw_ctx.ellipse([position_a, position_b], fill=GROUP_COLOR)
 
         # Draw label
-        font = ImageFont.truetype("assets/Roboto-Light.ttf", 30)
-        text_pos = (center[0] - 80, center[1] - group_radius - 35)
-        draw_ctx.text(text_pos, self.group_name, font=font, fill="BLACK")
-        #print(self.group_name)
+        font = label_font(draw_ctx, GROUP_LABEL_SIZE)
+        text_pos = (self.center[0] - 80, self.center[1] - group_radius - 35)
+        draw_ctx.text(text_pos, self.group_name, font=font, fill=LABEL_COLOR)
 
         # Draw nodes within group
-        circles_drawn = []
-        for key in self.cluster_nodes:
-            def randomize_fn():
-                cluster_radius = self.cluster_nodes[key].get_radius()
-                radius = (group_radius - cluster_radius) * random.random()
-                angle = rand_angle()
-                cur_position = circle_pos(center, radius, angle)
-                return Circle(cur_position, cluster_radius)
-
-            def draw_fn(circle):
-                self.cluster_nodes[key].draw(draw_ctx, circle.position, network_type)
-
-            circles_drawn = repeat_draw_until_success(randomize_fn, draw_fn, circles_drawn)
+        for cluster_node in self.cluster_nodes.values():
+            cluster_node.draw(draw_ctx, network_type)
 
 class Network:
     def __init__(self):
         # Map from group name ("Hydro-Aro") to Group Nodes
         self.group_nodes = {}
 
+        # (Layout mode, seed) of the positions currently stored in the nodes, None if they need to be computed
+        self.layout_key = None
+        # Map from protein name to the centers of its single nodes, lines are drawn between them
+        self.fid_to_location = {}
+        # Map from (edge mode, max edges) to the segments of the current layout, see layout.network_edges
+        self.edge_cache = {}
+
     def insert(self, indexed_id, pair, culled_str):
         pair_sorted = "".join(sorted(pair))
         group_name = get_group_name(pair_sorted)
@@ -273,58 +291,123 @@ class Network:
             self.group_nodes[group_name] = GroupNode(group_name)
 
         self.group_nodes[group_name].insert(pair_sorted, indexed_id, culled_str)
+        self.layout_key = None
 
-
-    def draw(self, network_type):
+    def get_size(self):
         # Sizing for the png outputs
         width = height = int(len(self.group_nodes) ** 1.05) * 120
-        margin = width / 4
+        return width, height
 
-        width_start = margin / 2
-        width_end = width - margin / 2
-        width_span = width - margin
-        height_start = margin / 2
-        height_end = height - margin / 2
-        height_span = height - margin
-        borders = [width_start, width_end, height_start, height_end]
-
-        image = Image.new("RGB", (width, height), "white")
-        draw_ctx = ImageDraw.Draw(image, "RGBA")
+    def layout(self, seed=0, mode="random"):
+        # Place every node once, the same mode and seed always give the same positions and every image of the network reuses them
+        if self.layout_key == (mode, seed):
+            return
 
-        circles_drawn = []
-        for key in self.group_nodes:
-            def randomize_fn():
-                radius = self.group_nodes[key].get_radius()
-                center = (random.random() * width_span + width_start, random.random() * height_span + height_start)
-                return Circle(center, radius)
-
-            def draw_fn(circle):
-                self.group_nodes[key].draw(draw_ctx, circle.position, network_type)
-
-            circles_drawn = repeat_draw_until_success(randomize_fn, draw_fn, circles_drawn, borders)
-
-        # Draw all lines
-        global fid_to_location
-        #print(fid_to_location)
-        for dics, (names , centers) in enumerate(fid_to_location.items()):
-            if len(centers) <= 1:
-                continue
-            for i in range(len(centers)):
-                for j in range(i, len(centers)):
-                    draw_ctx.line([centers[i], centers[j]], fill=(0, 0, 0, 60), width=3)
-                # font = ImageFont.truetype("assets/Roboto-Light.ttf", 10)
-                # text_pos = ([centers[i][0], centers[i][1]])
-                # draw_ctx.text(text_pos, names, font=font, fill="BLACK")
-
-
-        
-        # Reset lines
-        fid_to_location = {}
+        import numpy as np
+        import layout
 
+        keys = sorted(self.group_nodes)
+        if mode == "packed":
+            self.pack()
+        else:
+            width, height = self.get_size()
+            margin = width / 4
+            borders = (margin / 2, width - margin / 2, margin / 2, height - margin / 2)
+
+            rng = np.random.default_rng(seed)
+            radii = [self.group_nodes[key].get_radius() for key in keys]
+            centers, overlapping = layout.pack_in_rectangle(rng, borders, radii)
+            for key, center in zip(keys, centers):
+                overlapping += self.group_nodes[key].layout(rng, center)
+            if overlapping > 0:
+                print("No free space found for {} circles of the network, they overlap others".format(overlapping))
+
+        self.fid_to_location = {}
+        for key in keys:
+            group_node = self.group_nodes[key]
+            for cluster_key in sorted(group_node.cluster_nodes):
+                for indexed_id, single_node in sorted(group_node.cluster_nodes[cluster_key].single_nodes.items()):
+                    self.fid_to_location.setdefault(single_node.fid, []).append(single_node.center)
+
+        self.edge_cache = {}
+        self.layout_key = (mode, seed)
+
+    def pack(self):
+        # Groups, clusters and single nodes nested without overlaps (layout.pack_hierarchy), every single node with the same area
+        data = []
+        for key in sorted(self.group_nodes):
+            group_node = self.group_nodes[key]
+            group_data = {"id": group_node, "datum": 0, "children": []}
+            for cluster_key in sorted(group_node.cluster_nodes):
+                cluster_node = group_node.cluster_nodes[cluster_key]
+                singles = [{"id": single_node, "datum": 1} for _, single_node in sorted(cluster_node.single_nodes.items())]
+                group_data["children"].append({"id": cluster_node, "datum": len(singles), "children": singles})
+                group_data["datum"] += len(singles)
+            data.append(group_data)
+
+        # Same canvas and margin as the random layout
+        import layout
+
+        width, height = self.get_size()
+        circles = layout.pack_hierarchy(data, (width / 2, height / 2), 3 * min(width, height) / 8)
+        for node, (center, radius) in circles.items():
+            node.center, node.radius = center, radius
+
+    def edges(self, mode="all", max_edges=None):
+        # Segments between the single nodes of each protein and how many edges each bundles, computed once per layout
+        import layout
+
+        key = (mode, max_edges)
+        if key not in self.edge_cache:
+            self.edge_cache[key] = layout.network_edges(self.fid_to_location, mode, max_edges)
+        return self.edge_cache[key]
+
+    def render(self, draw_ctx, network_type, edges="all", max_edges=None):
+        # Draw the current layout on a PIL ImageDraw or a vector canvas
+        for group_node in self.group_nodes.values():
+            group_node.draw(draw_ctx, network_type)
+
+        # Draw all lines, one per distinct segment (darker for segments shared by several edges)
+        import layout
+
+        segments, counts = self.edges(edges, max_edges)
+        for segment, alpha in zip(segments.tolist(), layout.edge_alpha(counts).tolist()):
+            draw_ctx.line(segment, fill=EDGE_COLOR + (alpha,), width=EDGE_WIDTH)
+
+    def draw(self, network_type, seed=0, edges="all", max_edges=None, layout_mode="random"):
+        self.layout(seed, layout_mode)
+
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", self.get_size(), BACKGROUND_COLOR)
+        draw_ctx = ImageDraw.Draw(image, "RGBA")
+        self.render(draw_ctx, network_type, edges, max_edges)
         return image
 
+    def save(self, filepath, network_type, seed=0, edges="all", max_edges=None, layout_mode="random"):
+        # .svg and .pdf files are streamed element by element (vector.py), .dzi files are pyramids of tiles (tiles.py),
+        # anything else is drawn by PIL and saved as a PNG
+        import tiles
+        import vector
+
+        if os.path.splitext(filepath)[1].lower() == ".dzi":
+            self.layout(seed, layout_mode)
+            recorder = tiles.DrawingRecorder()
+            self.render(recorder, network_type, edges, max_edges)
+            tiles.write_pyramid(filepath, recorder, self.get_size(), truetype_font, background=BACKGROUND_COLOR)
+            return
+        if vector.vector_format(filepath) == None:
+            image = self.draw(network_type, seed, edges, max_edges, layout_mode)
+            image.save(filepath, "PNG", dpi=(100000,100000))
+            return
+
+        self.layout(seed, layout_mode)
+        with vector.open_canvas(filepath, self.get_size(), BACKGROUND_COLOR) as draw_ctx:
+            self.render(draw_ctx, network_type, edges, max_edges)
+
 def net_counts(name_list, loc_list, net_dict):
     # outputs csv of sequences and their classfication(s)
+    import pandas as pd
 
     for idx, name in enumerate(name_list):
         if name in net_dict:
@@ -339,6 +422,7 @@ def net_counts(name_list, loc_list, net_dict):
 
 def net_counts_2(name_list, loc_list, net_dict):
 # outputs csv of different classifications and their corresponding sub-sequences 
+    import pandas as pd
 
     for idx, loc in enumerate(loc_list):
         if loc in net_dict:
@@ -354,35 +438,24 @@ def net_counts_2(name_list, loc_list, net_dict):
 if __name__ == "__main__":
     args = parse_args()
     network = Network()
-    cluster_input_dir = os.path.join(args.input, "clusters")
-    ll = os.listdir(cluster_input_dir)
-    clusters, groups = {}, {}
+    if os.path.isfile(args.input):
+        cluster_rows = read_cluster_table(args.input)
+    else:
+        cluster_rows = read_cluster_csvs(os.path.join(args.input, "clusters"))
     net_dict = {}
     names, loc = [], []
     names2, loc2 = [], []
-    for cluster_file in ll:
-        cluster_name = cluster_file.split(".")[0]
+    for cluster_name, rows in cluster_rows.items():
         group_name = get_group_name(cluster_name)
-        try:
-            with open(os.path.join(cluster_input_dir, cluster_file), 'r') as f:
-                cluster_lines = f.readlines()
-        except:
-            #print("Invalid file format found: {}".format(cluster_input_dir))
-            continue
-        groups[group_name] = 0
-        clusters[cluster_name] = 0
-        for cluster_line in cluster_lines[1:]:
+        for indexed_id, culled_str in rows:
             gc, gc2 = [], []
-            groups[group_name] += 1
-            clusters[cluster_name] += 1
-            spl = cluster_line.split(",")
-            network.insert(spl[0], cluster_name, spl[1])
+            network.insert(indexed_id, cluster_name, culled_str)
 
-            names.append(spl[0].split(".", 1)[0])
+            names.append(indexed_id.split(".", 1)[0])
             gc.append(group_name)
             gc.append(cluster_name)
             loc.append(gc)
-            names2.append(spl[0])
+            names2.append(indexed_id)
             #gc2.append(group_name + "__" + cluster_name)
             #gc2.append(cluster_name)
             loc2.append(group_name + " : " + cluster_name)
@@ -395,28 +468,5 @@ if __name__ == "__main__":
 
 
 
-    gcs_image = network.draw(network_type="gcs")
-    gcs_image.save("gcs-"+ args.out, "PNG", dpi=(100000,100000))
-
-    gc_image = network.draw(network_type="gs")
-    gc_image.save("gs-"+ args.out, "PNG", dpi=(100000,100000))
-
-    # circlify_data = []
-    # for group_key, group_value in groups.items():
-    #     circlify_data.append({'id': group_key, 'datum': group_value, 'children': []})
-    #     for cluster_key, cluster_value in clusters.items():
-    #         group_name = get_group_name(cluster_key)
-    #         if group_name != group_key:
-    #             continue
-    #         circlify_data[-1]['children'].append({'id': cluster_key, 'datum': cluster_value})
-
-    # data = [
-    #     {'datum': 19, 'children': [0.5, 12]},
-    #     {'datum': 5, 'children': [0.5]},
-    #     {'datum': 5, 'children': [0.5]},
-    # ]
-
-    # circles = circ.circlify(circlify_data)
-    # fname = "gc-"+ args.out
-    # circ.bubbles(circles, fname)
-
+    network.save("gcs-"+ args.out, network_type="gcs", seed=args.seed, edges=args.edges, max_edges=args.max_edges, layout_mode=args.layout)
+    network.save("gs-"+ args.out, network_type="gs", seed=args.seed, edges=args.edges, max_edges=args.max_edges, layout_mode=args.layout)